@@ -1,12 +1,17 @@
 # app_window.py
 
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QStackedWidget
-from PyQt5.QtCore import Qt, QRectF, QPoint
-from PyQt5.QtGui import QPainter, QPainterPath, QBrush, QColor
+from PyQt5.QtCore import Qt, QPoint
+
+from background import RoundedBackground
+import diagnostics
+import theme
 
 class AppWindow(QWidget):
     def __init__(self, icon, window_title, always_on_top=True, parent=None):
         super().__init__(parent)
+        self.setObjectName("appWindow")  # scope of the theme.py rules
+        theme.attach(self)
         self.setWindowTitle(window_title)
         self.setWindowIcon(icon)
         self.setWindowFlags(Qt.FramelessWindowHint | (Qt.WindowStaysOnTopHint if always_on_top else Qt.Widget))
@@ -17,6 +22,7 @@ class AppWindow(QWidget):
 
         # Default to light theme
         self.bg_color = "#fafafa"
+        self.background = RoundedBackground(24)
 
         self.stacked = QStackedWidget(self)
         layout = QVBoxLayout(self)
@@ -28,28 +34,11 @@ class AppWindow(QWidget):
         self.bg_color = color
         self.update()
 
+    @diagnostics.timed("paint")
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        rect = QRectF(self.rect())
-        path = QPainterPath()
-        path.addRoundedRect(rect, 24, 24)
-        painter.fillPath(path, QBrush(QColor(self.bg_color)))
-        if not getattr(self, "_always_on_top", True):
-            border_color = QColor("#5a5a5a")
-            border_width = 3
-            shrink = border_width / 2
-            border_rect = rect.adjusted(shrink, shrink, -shrink, -shrink)
-            border_path = QPainterPath()
-            border_path.addRoundedRect(border_rect, 24 - shrink, 24 - shrink)
-            pen = painter.pen()
-            pen.setColor(border_color)
-            pen.setWidth(border_width)
-            pen.setStyle(Qt.DashLine)
-            painter.setPen(pen)
-            painter.drawPath(border_path)
-        else:
-            painter.setPen(Qt.NoPen)
+        # Dashed border marks the window as not always-on-top
+        self.background.paint(self, self.bg_color, not getattr(self, "_always_on_top", True))
+        diagnostics.painted()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -77,6 +66,10 @@ class AppWindow(QWidget):
     def widget(self, idx):
         return self.stacked.widget(idx)
 
+    def set_always_on_top(self, on_top):
+        if bool(self.windowFlags() & Qt.WindowStaysOnTopHint) != bool(on_top):
+            self.toggle_always_on_top()
+
     def toggle_always_on_top(self):
         current = self.windowFlags()
         if current & Qt.WindowStaysOnTopHint:
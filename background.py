@@ -0,0 +1,79 @@
+# background.py
+
+import time
+
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QPainter, QPainterPath, QBrush, QColor, QPixmap
+
+BORDER_COLOR = "#5a5a5a"
+BORDER_WIDTH = 3
+
+class RoundedBackground:
+    """
+    Rounded window background rendered once into a pixmap and reused
+    until the size, device pixel ratio, colour or border state changes.
+    """
+    def __init__(self, radius=24):
+        self.radius = radius
+        self._key = None
+        self._pixmap = None
+        # Counters to compare cached blits against full re-renders
+        self.paint_count = 0
+        self.render_count = 0
+        self.render_seconds = 0.0
+        self.blit_seconds = 0.0
+
+    def invalidate(self):
+        self._key = None
+        self._pixmap = None
+
+    def paint(self, widget, color, dashed_border=False):
+        dpr = widget.devicePixelRatioF()
+        key = (widget.width(), widget.height(), dpr, color, dashed_border)
+        if key != self._key:
+            start = time.perf_counter()
+            self._pixmap = self._render(widget.width(), widget.height(), dpr, color, dashed_border)
+            self.render_seconds += time.perf_counter() - start
+            self.render_count += 1
+            self._key = key
+        start = time.perf_counter()
+        painter = QPainter(widget)
+        painter.drawPixmap(0, 0, self._pixmap)
+        painter.end()
+        self.blit_seconds += time.perf_counter() - start
+        self.paint_count += 1
+
+    def _render(self, width, height, dpr, color, dashed_border):
+        pixmap = QPixmap(max(1, round(width * dpr)), max(1, round(height * dpr)))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = QRectF(0, 0, width, height)
+        path = QPainterPath()
+        path.addRoundedRect(rect, self.radius, self.radius)
+        painter.fillPath(path, QBrush(QColor(color)))
+        if dashed_border:
+            shrink = BORDER_WIDTH / 2
+            border_rect = rect.adjusted(shrink, shrink, -shrink, -shrink)
+            border_path = QPainterPath()
+            border_path.addRoundedRect(border_rect, self.radius - shrink, self.radius - shrink)
+            pen = painter.pen()
+            pen.setColor(QColor(BORDER_COLOR))
+            pen.setWidth(BORDER_WIDTH)
+            pen.setStyle(Qt.DashLine)
+            painter.setPen(pen)
+            painter.drawPath(border_path)
+        painter.end()
+        return pixmap
+
+    def stats(self):
+        """Paint/render counters; cache_hits are repaints that skipped path rendering."""
+        avg_render = self.render_seconds / self.render_count if self.render_count else 0.0
+        return {
+            "paints": self.paint_count,
+            "renders": self.render_count,
+            "cache_hits": self.paint_count - self.render_count,
+            "avg_render_ms": avg_render * 1000,
+            "avg_blit_ms": (self.blit_seconds / self.paint_count * 1000) if self.paint_count else 0.0,
+        }
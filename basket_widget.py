@@ -0,0 +1,236 @@
+# basket_widget.py
+
+from version import VERSION
+
+from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QApplication
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont
+from calculator import parse_cents, format_cents, to_units, units_to_bgn_cents, units_to_eur_cents
+from frame_scheduler import FrameScheduler
+import diagnostics
+
+class BasketWidget(QWidget):
+    def __init__(self, parent=None, settings=None):
+        super().__init__(parent)
+        self.settings = settings or {}
+        self.bgn_mode = True
+        self.entry = ""
+        # Each item is (units, bgn_mode, cents); totals are kept as exact units
+        self.items = []
+        self.total_units = 0
+        self.minimal_mode = False
+        self._open_updates_callback = None
+        self._last_copied = None  # For clipboard optimization
+        self.label_updates = FrameScheduler(self.update_labels, self)  # typed keys refresh once per frame
+
+        # Fonts
+        self.font_big = QFont("Arial", 24, QFont.Bold)
+        self.font_medium = QFont("Arial", 18)
+        self.font_small = QFont("Arial", 12)
+
+        # Labels
+        self.count_label = QLabel("Кошница:")
+        self.count_label.setFont(self.font_small)
+        self.count_label.setAlignment(Qt.AlignCenter)
+
+        self.entry_label = QLabel("0.00 лв.")
+        self.entry_label.setAlignment(Qt.AlignCenter)
+        self.entry_label.setFont(self.font_big)
+
+        self.total_bgn_label = QLabel("0.00 лв.")
+        self.total_bgn_label.setAlignment(Qt.AlignCenter)
+        self.total_bgn_label.setFont(self.font_medium)
+
+        self.total_eur_label = QLabel("€0.00")
+        self.total_eur_label.setAlignment(Qt.AlignCenter)
+        self.total_eur_label.setFont(self.font_medium)
+
+        self.version_label = QLabel(f"версия {VERSION}")
+        self.version_label.setAlignment(Qt.AlignCenter)
+        self.version_label.setFont(self.font_small)
+        self.version_label.setCursor(Qt.PointingHandCursor)
+        self.version_label.mousePressEvent = self._open_updates
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setSpacing(4)
+        self.layout.setContentsMargins(10, 5, 10, 5)
+
+        self._build_layout(self.minimal_mode)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setFocus()
+        self.update_labels()
+
+    def set_open_updates_callback(self, callback):
+        self._open_updates_callback = callback
+
+    def _open_updates(self, event):
+        if self._open_updates_callback:
+            self._open_updates_callback()
+
+    def set_update_available(self, available):
+        if available:
+            self.version_label.setText("Налична е нова версия!")
+        else:
+            self.version_label.setText(f"версия {VERSION}")
+
+    @property
+    def auto_copy_enabled(self):
+        return self.settings.get("auto_copy_result", False)
+
+    def set_mode(self, minimal):
+        self.minimal_mode = minimal
+        self._build_layout(minimal)
+        self.update_labels()
+
+    def _build_layout(self, minimal):
+        while self.layout.count():
+            item = self.layout.takeAt(0)
+            widget = item.widget()
+            if widget is not None:
+                widget.setParent(None)
+            elif item.layout():
+                self._clear_sub_layout(item.layout())
+        if minimal:
+            self.setFixedSize(325, 50)
+            self.entry_label.setFont(self.font_medium)
+            self.total_bgn_label.setFont(self.font_small)
+            self.total_eur_label.setFont(self.font_small)
+            h_layout = QHBoxLayout()
+            h_layout.setContentsMargins(10, 5, 10, 5)
+            h_layout.setSpacing(8)
+            h_layout.addStretch()
+            h_layout.addWidget(self.entry_label)
+            h_layout.addWidget(self.total_bgn_label)
+            h_layout.addWidget(self.total_eur_label)
+            h_layout.addStretch()
+            self.layout.addLayout(h_layout)
+            self.entry_label.show()
+            self.total_bgn_label.show()
+            self.total_eur_label.show()
+            self.count_label.hide()
+            self.version_label.hide()
+        else:
+            self.setFixedSize(250, 220)
+            self.count_label.setFont(self.font_small)
+            self.entry_label.setFont(self.font_big)
+            self.total_bgn_label.setFont(self.font_medium)
+            self.total_eur_label.setFont(self.font_medium)
+            self.layout.addWidget(self.count_label)
+            self.layout.addWidget(self.entry_label)
+            self.layout.addWidget(self.total_bgn_label)
+            self.layout.addWidget(self.total_eur_label)
+            self.layout.addWidget(self.version_label)
+            self.count_label.show()
+            self.entry_label.show()
+            self.total_bgn_label.show()
+            self.total_eur_label.show()
+            self.version_label.show()
+
+    def _clear_sub_layout(self, layout):
+        while layout.count():
+            item = layout.takeAt(0)
+            widget = item.widget()
+            if widget is not None:
+                widget.setParent(None)
+            elif item.layout():
+                self._clear_sub_layout(item.layout())
+
+    def add_item(self):
+        cents = parse_cents(self.entry)
+        if cents <= 0:
+            return
+        units = to_units(bgn_cents=cents) if self.bgn_mode else to_units(eur_cents=cents)
+        self.items.append((units, self.bgn_mode, cents))
+        self.total_units += units
+        self.entry = ""
+        self.update_labels()
+
+    def undo_last(self):
+        if not self.items:
+            return
+        units = self.items.pop()[0]
+        self.total_units -= units
+        self.update_labels()
+
+    def clear(self):
+        self.items = []
+        self.total_units = 0
+        self.entry = ""
+        self.update_labels()
+
+    def restore(self, items, entry, bgn_mode):
+        """Bring back a saved basket: items as (cents, in BGN) pairs."""
+        self.items = [
+            (to_units(bgn_cents=cents) if bgn else to_units(eur_cents=cents), bgn, cents) for cents, bgn in items
+        ]
+        self.total_units = sum(units for units, _, _ in self.items)
+        self.entry = entry
+        self.bgn_mode = bgn_mode
+        self.update_labels()
+
+    def total_bgn_cents(self):
+        return units_to_bgn_cents(self.total_units)
+
+    def total_eur_cents(self):
+        return units_to_eur_cents(self.total_units)
+
+    def toggle_currency(self):
+        self.bgn_mode = not self.bgn_mode
+        self.entry = ""
+        self.update_labels()
+
+    @diagnostics.timed("update_labels")
+    def update_labels(self):
+        entry_text = format_cents(parse_cents(self.entry))
+        if self.bgn_mode:
+            self.entry_label.setText(f"{entry_text} лв.")
+        else:
+            self.entry_label.setText(f"€{entry_text}")
+        bgn_text = format_cents(self.total_bgn_cents())
+        eur_text = format_cents(self.total_eur_cents())
+        if self.minimal_mode:
+            self.total_bgn_label.setText(f"Σ {bgn_text} лв.")
+        else:
+            self.total_bgn_label.setText(f"{bgn_text} лв.")
+        self.total_eur_label.setText(f"€{eur_text}")
+        self.count_label.setText(f"Кошница: {len(self.items)} арт.")
+        # Clipboard optimization: Only copy if enabled, and value changed and nonzero
+        if self.auto_copy_enabled and self.items and eur_text != self._last_copied:
+            with diagnostics.stage("clipboard"):
+                QApplication.clipboard().setText(eur_text)
+            self._last_copied = eur_text
+
+    @diagnostics.timed("key_handler")
+    def keyPressEvent(self, event):
+        key = event.key()
+        if Qt.Key_0 <= key <= Qt.Key_9:
+            if len(self.entry) < 10:
+                self.entry += event.text()
+                self.label_updates.request()
+        elif key == Qt.Key_Backspace:
+            self.entry = self.entry[:-1]
+            self.label_updates.request()
+        elif key in (Qt.Key_Comma, Qt.Key_Period):
+            if '.' not in self.entry:
+                self.entry += '.'
+                self.label_updates.request()
+        elif key in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Plus):
+            self.add_item()
+        elif key == Qt.Key_Delete or (key == Qt.Key_Z and event.modifiers() & Qt.ControlModifier):
+            self.undo_last()
+        elif key == Qt.Key_Escape:
+            if self.entry:
+                self.entry = ""
+                self.update_labels()
+            else:
+                self.clear()
+        elif key == Qt.Key_Space:
+            self.toggle_currency()
+        elif key == Qt.Key_Tab:
+            self.clearFocus()
+            self.parentWidget().setFocus()
+        elif key == Qt.Key_A and not event.modifiers():
+            self.clearFocus()
+            self.parentWidget().setFocus()
+        else:
+            super().keyPressEvent(event)
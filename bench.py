@@ -0,0 +1,182 @@
+# bench.py
+#
+# Developer benchmarks. Usage:  python bench.py {delta,hash,rates,theme,typing} [size]
+
+import os
+import sys
+import time
+import tempfile
+
+def bench_delta(size_mb=30, runs=5):
+    """Delta size and apply time for a synthetic installer with a few small edits."""
+    from delta import make_delta, apply_delta
+    source = os.urandom(size_mb * 1024 * 1024)
+    target = bytearray(source)
+    target[100000:100000] = os.urandom(20000)  # inserted module
+    del target[len(target) // 2:len(target) // 2 + 8000]  # removed code
+    target[-300000:-299000] = os.urandom(1000)  # changed resources
+    target = bytes(target)
+
+    start = time.perf_counter()
+    delta = make_delta(source, target)
+    make_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, "old.exe")
+        delta_path = os.path.join(tmp, "patch.delta")
+        out_path = os.path.join(tmp, "new.exe")
+        with open(source_path, "wb") as f:
+            f.write(source)
+        with open(delta_path, "wb") as f:
+            f.write(delta)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            apply_delta(source_path, delta_path, out_path)
+            timings.append(time.perf_counter() - start)
+        with open(out_path, "rb") as f:
+            assert f.read() == target
+    print(f"target {len(target)} bytes, delta {len(delta)} bytes, saved {len(target) - len(delta)} bytes")
+    print(f"make {make_seconds:.2f} s, apply best {min(timings) * 1000:.1f} ms / median {sorted(timings)[runs // 2] * 1000:.1f} ms")
+
+def bench_hash(size_mb=64, runs=5):
+    """Cost of hashing in the download loop: unbuffered 64 KB chunk writes with and without sha256."""
+    import hashlib
+    from update import CHUNK_SIZE
+    data = os.urandom(size_mb * 1024 * 1024)
+    chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+    def write_all(path, hasher):
+        start = time.perf_counter()
+        with open(path, "wb", buffering=0) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                if hasher:
+                    hasher.update(chunk)
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "setup.exe.part")
+        plain = min(write_all(path, None) for _ in range(runs))
+        hashed = min(write_all(path, hashlib.sha256()) for _ in range(runs))
+    per_chunk_us = (hashed - plain) * 1e6 / len(chunks)
+    print(f"{size_mb} MB in {len(chunks)} chunks: write {plain * 1000:.1f} ms, write+sha256 {hashed * 1000:.1f} ms")
+    print(f"sha256 {size_mb / max(hashed - plain, 1e-9):.0f} MB/s, {per_chunk_us:.1f} us per chunk")
+
+def bench_rates(count=100000):
+    """Single and batch lookups in a synthetic 25-year, 30-currency rate store."""
+    import random
+    import datetime
+    from rate_store import import_rates, RateStore
+    codes = [f"C{i:02d}" for i in range(29)] + ["BGN"]
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "eurofxref-hist.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("Date," + ",".join(codes) + "\n")
+            day = datetime.date(2000, 1, 3)
+            while day.year < 2025:
+                if day.weekday() < 5:
+                    f.write(day.isoformat() + "," + ",".join(f"{1 + random.random():.4f}" for _ in codes) + "\n")
+                day += datetime.timedelta(days=1)
+        out = os.path.join(tmp, "rates.bin")
+        start = time.perf_counter()
+        days, currencies = import_rates(source, out)
+        import_seconds = time.perf_counter() - start
+        items = [(datetime.date(2000, 1, 3) + datetime.timedelta(days=random.randrange(9000)), random.random() * 1000)
+                 for _ in range(count)]
+        with RateStore(out) as store:
+            start = time.perf_counter()
+            for date, amount in items:
+                store.convert(amount, "BGN", "C07", date)
+            single = time.perf_counter() - start
+            start = time.perf_counter()
+            store.convert_many(items, "BGN", "C07")
+            batch = time.perf_counter() - start
+        size = os.path.getsize(out)
+    print(f"{days} days x {currencies} currencies: import {import_seconds * 1000:.0f} ms, {size} bytes")
+    print(f"convert {single * 1e6 / count:.2f} us each, convert_many {batch * 1e6 / count:.2f} us each")
+
+def bench_theme(switches=40):
+    """Light/dark switches with one register and the info dialog (help tab) open."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from settings import SettingsModel, DEFAULT_SETTINGS
+    from main import Register
+    from dialogs import InfoDialog
+    settings = SettingsModel(DEFAULT_SETTINGS)
+    settings["theme"] = 0
+    register = Register(1, settings, QIcon(), lambda *args: None)
+    register.restore()
+    register.app_win.show()
+    dialog = InfoDialog(parent=register.app_win, app_settings=settings)
+    dialog.show()
+    dialog.tabs.setCurrentIndex(1)
+    app.processEvents()
+    timings = []
+    for i in range(switches):
+        start = time.perf_counter()
+        settings["theme"] = 1 if i % 2 == 0 else 0
+        app.processEvents()  # includes re-polish and repaint
+        timings.append(time.perf_counter() - start)
+    timings = timings[2:]  # the first switch per theme also renders the help HTML
+    timings.sort()
+    print(f"{len(timings)} switches: best {timings[0] * 1000:.2f} ms, median {timings[len(timings) // 2] * 1000:.2f} ms")
+
+def bench_typing(keys=600, gap_us=2000):
+    """GUI thread time per key for scanner-speed digits, with and without frame coalescing."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon, QKeyEvent
+    from PyQt5.QtCore import Qt, QEvent
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from settings import SettingsModel, DEFAULT_SETTINGS
+    from main import Register
+    settings = SettingsModel(DEFAULT_SETTINGS)
+    settings["auto_copy_result"] = True
+    register = Register(1, settings, QIcon(), lambda *args: None)
+    register.restore()
+    register.app_win.show()
+    converter = register.converter
+    scheduler = converter.label_updates
+    app.processEvents()
+
+    def burst():
+        busy = 0.0
+        for i in range(keys):
+            if i % 8 == 7:  # a price is at most 10 digits
+                key, text = Qt.Key_Escape, ""
+            else:
+                key, text = Qt.Key_0 + i % 10, str(i % 10)
+            start = time.perf_counter()
+            app.sendEvent(converter, QKeyEvent(QEvent.KeyPress, key, Qt.NoModifier, text))
+            app.processEvents()
+            busy += time.perf_counter() - start
+            time.sleep(gap_us / 1e6)
+        start = time.perf_counter()
+        while scheduler.pending:
+            app.processEvents()
+        return busy + time.perf_counter() - start
+
+    flushes = scheduler.flushes
+    coalesced = burst()
+    flushes = scheduler.flushes - flushes
+    scheduler.request = scheduler.flush  # every key refreshes the labels itself
+    immediate = burst()
+    print(f"{keys} keys {gap_us} us apart, frame {scheduler.frame * 1000:.1f} ms")
+    print(f"per key: immediate {immediate / keys * 1e6:.0f} us, coalesced {coalesced / keys * 1e6:.0f} us ({flushes} refreshes)")
+
+BENCHMARKS = {
+    "delta": bench_delta,
+    "hash": bench_hash,
+    "rates": bench_rates,
+    "theme": bench_theme,
+    "typing": bench_typing,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("usage: python bench.py {" + ",".join(BENCHMARKS) + "} [args]")
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*(int(a) for a in sys.argv[2:]))
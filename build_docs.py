@@ -0,0 +1,34 @@
+# build_docs.py
+#
+# Pre-renders Documentation/*.md into Documentation/docs_bundle.json.gz so the
+# packaged app can show help/about without the markdown package.
+# Run before PyInstaller:  python build_docs.py
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+
+from docs import DOCS_BUNDLE, render_markdown
+
+def build_bundle(doc_dir):
+    bundle = {}
+    for name in sorted(os.listdir(doc_dir)):
+        if not name.endswith(".md"):
+            continue
+        with open(os.path.join(doc_dir, name), encoding="utf-8") as f:
+            md_text = f.read()
+        bundle[name] = {
+            "sha256": hashlib.sha256(md_text.encode("utf-8")).hexdigest(),
+            "html": render_markdown(md_text),
+        }
+    out_path = os.path.join(doc_dir, DOCS_BUNDLE)
+    with gzip.open(out_path, "wt", encoding="utf-8", compresslevel=9) as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(",", ":"))
+    return out_path, len(bundle)
+
+if __name__ == "__main__":
+    doc_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Documentation")
+    out_path, count = build_bundle(doc_dir)
+    print(f"{count} documents -> {out_path} ({os.path.getsize(out_path)} bytes)")
@@ -1,7 +1,14 @@
 # calculator.py
 
+from fractions import Fraction
+from functools import lru_cache
+
 EXCHANGE_RATE = 1.95583
 
+# Exact rate as a fraction, for cent arithmetic without float drift
+RATE_NUM = 195583
+RATE_DEN = 100000
+
 def bgn_to_eur(bgn):
     """Convert BGN to EUR, rounded to 2 decimals."""
     return round(float(bgn) / EXCHANGE_RATE, 2)
@@ -10,10 +17,106 @@ def eur_to_bgn(eur):
     """Convert EUR to BGN, rounded to 2 decimals."""
     return round(float(eur) * EXCHANGE_RATE, 2)
 
-def calculate_change(price_bgn, paid_bgn):
+def calculate_change(price_bgn, paid_bgn, paid_eur=0):
     """
-    Given a price in BGN and paid amount in BGN,
+    Given a price in BGN and paid amount in BGN (optionally plus EUR),
     return change in EUR (rounded to 2 decimals).
     """
-    change_bgn = float(paid_bgn) - float(price_bgn)
-    return bgn_to_eur(change_bgn) if change_bgn >= 0 else 0.0
+    change_cents = calculate_change_cents(
+        round(float(price_bgn) * 100), round(float(paid_bgn) * 100), round(float(paid_eur) * 100)
+    )
+    return change_cents / 100
+
+def parse_cents(text):
+    """Parse an input buffer such as "12.5" into integer cents (1250)."""
+    if not text or text == ".":
+        return 0
+    whole, _, frac = text.partition(".")
+    frac = (frac + "00")[:2]
+    return int(whole or 0) * 100 + int(frac)
+
+def format_cents(cents):
+    """Format integer cents as "12.50"."""
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+def _div_round(num, den):
+    """Integer division rounded half away from zero."""
+    q, r = divmod(abs(num), den)
+    if 2 * r >= den:
+        q += 1
+    return q if num >= 0 else -q
+
+def round_cents(value):
+    """Round an exact amount (a Fraction or int) to integer cents, half away from zero."""
+    value = Fraction(value)
+    return _div_round(value.numerator * 100, value.denominator)
+
+def to_units(bgn_cents=0, eur_cents=0):
+    """
+    Combine BGN and EUR cents into one exact integer value
+    (BGN cents scaled by RATE_DEN), so sums never round.
+    """
+    return bgn_cents * RATE_DEN + eur_cents * RATE_NUM
+
+def units_to_bgn_cents(units):
+    return _div_round(units, RATE_DEN)
+
+def units_to_eur_cents(units):
+    return _div_round(units, RATE_NUM)
+
+def calculate_change_cents(price_bgn_cents, paid_bgn_cents, paid_eur_cents=0):
+    """
+    Change in EUR cents for a BGN price paid with BGN and/or EUR.
+    The tender is combined exactly before a single rounding step.
+    """
+    return change_eur_cents(to_units(price_bgn_cents), paid_bgn_cents, paid_eur_cents)
+
+def change_eur_cents(price_units, paid_bgn_cents, paid_eur_cents=0):
+    """
+    Change in EUR cents for an exact price (see to_units); only the change
+    itself is rounded. Zero when the tender does not cover the price.
+    """
+    change_units = to_units(paid_bgn_cents, paid_eur_cents) - price_units
+    return units_to_eur_cents(change_units) if change_units >= 0 else 0
+
+# Banknotes and coins in cents; 5 leva / 5 euro and up are banknotes in both currencies
+BGN_DENOMINATIONS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+EUR_DENOMINATIONS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+TENDER_ROUND = 100
+MIN_BANKNOTE = 500
+QUICK_TENDERS_PER_CURRENCY = 2
+
+def _next_tenders(price_units, denominations, unit_value):
+    """
+    The next round amount (whole leva or euro) that covers the price, then
+    the next banknotes above it; above the largest banknote, multiples of it.
+    """
+    round_tender = -(-price_units // (TENDER_ROUND * unit_value)) * TENDER_ROUND
+    tenders = [round_tender]
+    for d in denominations:
+        if d >= MIN_BANKNOTE and d > tenders[-1]:
+            tenders.append(d)
+        if len(tenders) == QUICK_TENDERS_PER_CURRENCY:
+            return tenders
+    largest = denominations[-1]
+    while len(tenders) < QUICK_TENDERS_PER_CURRENCY:
+        tenders.append((tenders[-1] // largest + 1) * largest)
+    return tenders
+
+@lru_cache(maxsize=256)
+def quick_tenders(price_units):
+    """
+    Likely tendered amounts for an exact price (see to_units), as a tuple of
+    (currency, tender_cents, change_eur_cents) with BGN suggestions first.
+    A round euro price is its own first EUR suggestion.
+    """
+    if price_units <= 0:
+        return ()
+    result = []
+    for tender in _next_tenders(price_units, BGN_DENOMINATIONS, RATE_DEN):
+        result.append(("BGN", tender, units_to_eur_cents(to_units(tender) - price_units)))
+    for tender in _next_tenders(price_units, EUR_DENOMINATIONS, RATE_NUM):
+        result.append(("EUR", tender, units_to_eur_cents(to_units(0, tender) - price_units)))
+    return tuple(result)
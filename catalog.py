@@ -0,0 +1,205 @@
+# catalog.py
+#
+# Local product catalog for barcode scanners: barcode -> name and price,
+# kept in SQLite (a WITHOUT ROWID table, so the barcode index is the table)
+# with an LRU in front for the codes scanned over and over.
+# A price list (CSV with barcode,name,price[,currency] columns) is
+# imported from the settings tab ("Импорт CSV..."), or with
+#   python catalog.py import products.csv
+
+import os
+import re
+import sys
+import csv
+import time
+import sqlite3
+from functools import lru_cache
+from collections import namedtuple
+
+from settings import get_user_settings_path
+from calculator import parse_cents
+
+LRU_SIZE = 4096
+IMPORT_BATCH = 20000
+PROGRESS_LINES = 5000  # report import progress every this many lines
+SCANNER_MAX_GAP = 0.03  # seconds between scanner keystrokes; people type slower
+SCANNER_MIN_LENGTH = 8  # EAN-8 is the shortest common code
+
+Product = namedtuple("Product", ["barcode", "name", "price_cents", "currency"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    barcode TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'BGN'
+) WITHOUT ROWID
+"""
+
+def catalog_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "catalog.sqlite")
+
+PRICE_RE = re.compile(r"\d+(?:[.,]\d{0,2})?")
+
+def _price_cents(text):
+    """Cents of a plain price such as "12.50" or "12,5"; ValueError for anything else."""
+    text = text.strip()
+    if not PRICE_RE.fullmatch(text):
+        raise ValueError(f"invalid price: {text!r}")
+    return parse_cents(text.replace(",", "."))
+
+class Catalog:
+    def __init__(self, path=None):
+        self.path = path or catalog_path()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(SCHEMA)
+        self.lookup = lru_cache(maxsize=LRU_SIZE)(self._lookup)
+
+    def close(self):
+        self.conn.close()
+
+    def _lookup(self, barcode):
+        row = self.conn.execute(
+            "SELECT barcode, name, price_cents, currency FROM products WHERE barcode = ?", (barcode,)
+        ).fetchone()
+        return Product(*row) if row else None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def import_rows(self, rows):
+        """
+        Insert or replace (barcode, name, price_cents, currency) tuples from
+        any iterable, in batches inside a single transaction.
+        """
+        self.conn.execute("PRAGMA journal_mode=MEMORY")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        total = 0
+        batch = []
+        with self.conn:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH:
+                    self.conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)", batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)", batch)
+                total += len(batch)
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.lookup.cache_clear()
+        return total
+
+    def import_csv(self, csv_path, on_progress=None):
+        """
+        Stream a barcode,name,price[,currency] CSV (a header row is skipped).
+        on_progress gets the percentage of the file read. A product row
+        without a valid price is skipped, not imported; returns
+        (rows imported, rows rejected).
+        """
+        size = os.path.getsize(csv_path) or 1
+        rejected = 0
+
+        def lines(f):
+            done = 0
+            for i, raw in enumerate(f):
+                done += len(raw)
+                if on_progress and i % PROGRESS_LINES == 0:
+                    on_progress(done * 100 // size)
+                yield raw.decode("utf-8-sig" if i == 0 else "utf-8")
+
+        def rows():
+            nonlocal rejected
+            with open(csv_path, "rb") as f:
+                for record in csv.reader(lines(f)):
+                    if not record or not record[0].strip().isdigit():
+                        continue
+                    try:
+                        price_cents = _price_cents(record[2])
+                    except (IndexError, ValueError):
+                        rejected += 1
+                        continue
+                    currency = record[3].strip().upper() if len(record) > 3 and record[3].strip() else "BGN"
+                    yield record[0].strip(), record[1].strip(), price_cents, currency
+        return self.import_rows(rows()), rejected
+
+_catalog = None
+
+def get_catalog():
+    """Shared catalog, or None when no price list has been imported."""
+    global _catalog
+    if _catalog is None and os.path.exists(catalog_path()):
+        _catalog = Catalog()
+    return _catalog
+
+def reload():
+    """Drop the shared catalog (and its lookup cache) after an import; the next lookup reopens it."""
+    global _catalog
+    if _catalog is not None:
+        _catalog.close()
+        _catalog = None
+
+def product_count():
+    """Products in the imported price list (0 without one); opens its own connection, for any thread."""
+    if not os.path.exists(catalog_path()):
+        return 0
+    catalog = Catalog()
+    try:
+        return catalog.count()
+    finally:
+        catalog.close()
+
+def import_file(csv_path, on_progress=None):
+    """
+    Import on the calling thread with its own connection; returns
+    (rows imported, rows rejected, products in total).
+    """
+    catalog = Catalog()
+    try:
+        count, rejected = catalog.import_csv(csv_path, on_progress=on_progress)
+        return count, rejected, catalog.count()
+    finally:
+        catalog.close()
+
+class ScannerBurstDetector:
+    """
+    Tells barcode scanner input from typing: a scanner sends the whole code
+    a few milliseconds apart and ends it with Enter. The input as it was
+    before the burst is kept so the digits can be taken back.
+    """
+    def __init__(self, max_gap=SCANNER_MAX_GAP, min_length=SCANNER_MIN_LENGTH):
+        self.max_gap = max_gap
+        self.min_length = min_length
+        self.chars = []
+        self.snapshot = None
+        self._last = None
+
+    def feed(self, char, snapshot, now=None):
+        """Record a digit key; snapshot is the input to restore if it turns out to be a scan."""
+        now = time.monotonic() if now is None else now
+        if self._last is None or now - self._last > self.max_gap:
+            self.chars = []
+            self.snapshot = snapshot
+        self.chars.append(char)
+        self._last = now
+
+    def finish(self, now=None):
+        """On Enter: the scanned code, or None when the digits were typed by hand."""
+        now = time.monotonic() if now is None else now
+        code = None
+        if self._last is not None and now - self._last <= self.max_gap and len(self.chars) >= self.min_length:
+            code = "".join(self.chars)
+        self.chars = []
+        self._last = None
+        return code
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "import":
+        print("usage: python catalog.py import products.csv")
+        sys.exit(1)
+    start = time.perf_counter()
+    catalog = Catalog()
+    count, rejected = catalog.import_csv(sys.argv[2])
+    print(f"{count} products in {time.perf_counter() - start:.1f} s -> {catalog.path} ({catalog.count()} total)")
+    if rejected:
+        print(f"{rejected} rows skipped: invalid price")
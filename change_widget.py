@@ -5,22 +5,33 @@ from version import VERSION
 from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QApplication
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
-from calculator import calculate_change
+from calculator import change_eur_cents, parse_cents, format_cents, quick_tenders, to_units, units_to_bgn_cents
+from frame_scheduler import FrameScheduler
+import diagnostics
+import receipt
+
+# F-keys for the quick tender suggestions, in the order quick_tenders returns them
+QUICK_TENDER_KEYS = (Qt.Key_F2, Qt.Key_F3, Qt.Key_F4, Qt.Key_F5)
 
 class ChangeWidget(QWidget):
     def __init__(self, parent=None, settings=None):
         super().__init__(parent)
-        self.price_bgn = 0.0
+        self.price_units = 0  # exact price, see calculator.to_units
         self.paid_bgn = ""
+        self.paid_eur = ""
+        self.tender_eur = False  # Which currency the keypad is typing into
+        self.tenders = ()
         self.minimal_mode = False
         self._open_updates_callback = None
         self.settings = settings or {}
         self._last_copied = None  # For clipboard optimization
+        self.label_updates = FrameScheduler(self.update_labels, self)  # typed keys refresh once per frame
 
         # Fonts
         self.font_big = QFont("Arial", 24, QFont.Bold)
         self.font_medium = QFont("Arial", 18)
         self.font_small = QFont("Arial", 12)
+        self.font_tiny = QFont("Arial", 9)
 
         # Labels
         self.rest_label = QLabel("Ресто:")
@@ -47,6 +58,10 @@ class ChangeWidget(QWidget):
         self.given_label.setFont(self.font_small)
         self.given_label.setAlignment(Qt.AlignCenter)
 
+        self.tender_label = QLabel("")
+        self.tender_label.setFont(self.font_tiny)
+        self.tender_label.setAlignment(Qt.AlignCenter)
+
         self.layout = QVBoxLayout(self)
         self.layout.setSpacing(8)
         self.layout.setContentsMargins(10, 5, 10, 5)
@@ -69,12 +84,6 @@ class ChangeWidget(QWidget):
         else:
             self.version_label.setText(f"версия {VERSION}")
 
-    def set_version_label_color(self, color):
-        self.version_label.setStyleSheet(f"color:{color};")
-        self.rest_label.setStyleSheet(f"color:{color};")
-        self.given_label.setStyleSheet(f"color:{color};")
-        self.paid_label.setStyleSheet(f"color:{color};")
-
     @property
     def auto_copy_enabled(self):
         return self.settings.get("auto_copy_result", False)
@@ -109,6 +118,7 @@ class ChangeWidget(QWidget):
             self.rest_label.show()
             self.paid_label.show()
             self.change_label.show()
+            self.tender_label.hide()
             self.version_label.hide()
         else:
             self.setFixedSize(250, 220)
@@ -120,11 +130,13 @@ class ChangeWidget(QWidget):
             self.layout.addWidget(self.paid_label)
             self.layout.addWidget(self.rest_label)
             self.layout.addWidget(self.change_label)
+            self.layout.addWidget(self.tender_label)
             self.layout.addWidget(self.version_label)
             self.given_label.show()
             self.rest_label.show()
             self.paid_label.show()
             self.change_label.show()
+            self.tender_label.show()
             self.version_label.show()
 
     def _clear_sub_layout(self, layout):
@@ -136,45 +148,141 @@ class ChangeWidget(QWidget):
             elif item.layout():
                 self._clear_sub_layout(item.layout())
 
+    @property
+    def price_bgn_cents(self):
+        return units_to_bgn_cents(self.price_units)
+
     def set_price_bgn(self, price_bgn):
-        self.price_bgn = price_bgn
+        self.set_price_units(to_units(round(float(price_bgn) * 100)))
+
+    def set_price_units(self, price_units):
+        """Take the price exactly, so a euro price is not rounded through leva."""
+        self.price_units = price_units
+        self.tenders = quick_tenders(price_units)
+        self.tender_label.setText(self._tenders_text())
+        self.reset_tender()
+
+    def reset_tender(self):
         self.paid_bgn = ""
+        self.paid_eur = ""
+        self.tender_eur = False
         self.update_labels()
 
+    def apply_quick_tender(self, index):
+        if index >= len(self.tenders):
+            return
+        currency, tender_cents, _ = self.tenders[index]
+        self.paid_bgn = ""
+        self.paid_eur = ""
+        self.tender_eur = currency == "EUR"
+        self._active_buffer = format_cents(tender_cents)
+        self.update_labels()
+
+    def _tenders_text(self):
+        parts = []
+        for i, (currency, tender_cents, change_cents) in enumerate(self.tenders):
+            whole = tender_cents // 100
+            tender_text = f"{whole} лв." if currency == "BGN" else f"€{whole}"
+            parts.append(f"F{i + 2} {tender_text}→€{format_cents(change_cents)}")
+        lines = ["  ".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+        return "\n".join(lines)
+
+    def transaction(self):
+        """The price, tender and change in cents once the tender covers the price, else None."""
+        paid_bgn_cents = parse_cents(self.paid_bgn)
+        paid_eur_cents = parse_cents(self.paid_eur)
+        if self.price_units <= 0 or not (paid_bgn_cents or paid_eur_cents):
+            return None
+        if to_units(paid_bgn_cents, paid_eur_cents) < self.price_units:
+            return None  # underpaid: no change slip and no change record
+        return {
+            "bgn": self.price_bgn_cents,
+            "paid_bgn": paid_bgn_cents,
+            "paid_eur": paid_eur_cents,
+            "eur": change_eur_cents(self.price_units, paid_bgn_cents, paid_eur_cents),
+        }
+
+    def print_slip(self):
+        """Queue a change slip on the "printer_path" printer; beeps when there is nothing to print or the tender is short."""
+        transaction = self.transaction()
+        path = self.settings.get("printer_path", "")
+        if transaction is None or not path or not receipt.print_change(path, transaction):
+            QApplication.beep()
+
+    def toggle_tender_currency(self):
+        self.tender_eur = not self.tender_eur
+        self.update_labels()
+
+    @property
+    def _active_buffer(self):
+        return self.paid_eur if self.tender_eur else self.paid_bgn
+
+    @_active_buffer.setter
+    def _active_buffer(self, value):
+        if self.tender_eur:
+            self.paid_eur = value
+        else:
+            self.paid_bgn = value
+
+    def _paid_text(self, bgn_cents, eur_cents):
+        bgn_text = f"{format_cents(bgn_cents)} лв."
+        eur_text = f"€{format_cents(eur_cents)}"
+        # A single currency until the other one has an amount typed in
+        if not self.paid_eur and not self.tender_eur:
+            return bgn_text
+        if not self.paid_bgn and self.tender_eur:
+            return eur_text
+        # Mixed tender: underline the part the keypad is typing into
+        if self.tender_eur:
+            return f"{bgn_text} + <u>{eur_text}</u>"
+        return f"<u>{bgn_text}</u> + {eur_text}"
+
+    @diagnostics.timed("update_labels")
     def update_labels(self):
-        try:
-            paid_val = float(self.paid_bgn) if self.paid_bgn else 0.0
-        except ValueError:
-            paid_val = 0.0
-        self.paid_label.setText(f"{paid_val:.2f} лв.")
-        if paid_val > 0 and self.price_bgn > 0:
-            change_eur = calculate_change(self.price_bgn, paid_val)
-            self.change_label.setText(f"€{change_eur:.2f}")
-            result_text = f"{change_eur:.2f}"
+        paid_bgn_cents = parse_cents(self.paid_bgn)
+        paid_eur_cents = parse_cents(self.paid_eur)
+        paid_text = self._paid_text(paid_bgn_cents, paid_eur_cents)
+        if " + " in paid_text:
+            self.paid_label.setFont(self.font_small if self.minimal_mode else self.font_medium)
+        else:
+            self.paid_label.setFont(self.font_medium if self.minimal_mode else self.font_big)
+        self.given_label.setText("Дадена сума (€):" if self.tender_eur else "Дадена сума (лв.):")
+        self.paid_label.setText(paid_text)
+        if (paid_bgn_cents or paid_eur_cents) and self.price_units > 0:
+            change_text = format_cents(change_eur_cents(self.price_units, paid_bgn_cents, paid_eur_cents))
+            self.change_label.setText(f"€{change_text}")
+            result_text = change_text
         else:
             self.change_label.setText("€0.00")
             result_text = "0.00"
         # Clipboard optimization: Only copy if enabled, and value changed and nonzero
         if self.auto_copy_enabled and result_text and result_text != self._last_copied and result_text != "0.00":
-            QApplication.clipboard().setText(result_text)
+            with diagnostics.stage("clipboard"):
+                QApplication.clipboard().setText(result_text)
             self._last_copied = result_text
 
+    @diagnostics.timed("key_handler")
     def keyPressEvent(self, event):
         key = event.key()
         if Qt.Key_0 <= key <= Qt.Key_9:
-            if len(self.paid_bgn) < 10:
-                self.paid_bgn += event.text()
-                self.update_labels()
+            if len(self._active_buffer) < 10:
+                self._active_buffer += event.text()
+                self.label_updates.request()
         elif key == Qt.Key_Backspace:
-            self.paid_bgn = self.paid_bgn[:-1]
-            self.update_labels()
+            self._active_buffer = self._active_buffer[:-1]
+            self.label_updates.request()
         elif key in (Qt.Key_Comma, Qt.Key_Period):
-            if '.' not in self.paid_bgn:
-                self.paid_bgn += '.'
-                self.update_labels()
+            if '.' not in self._active_buffer:
+                self._active_buffer += '.'
+                self.label_updates.request()
         elif key == Qt.Key_Escape:
-            self.paid_bgn = ""
-            self.update_labels()
+            self.reset_tender()
+        elif key == Qt.Key_Space:
+            self.toggle_tender_currency()
+        elif key in QUICK_TENDER_KEYS:
+            self.apply_quick_tender(QUICK_TENDER_KEYS.index(key))
+        elif key == Qt.Key_P and not event.modifiers():
+            self.print_slip()
         elif key == Qt.Key_Tab:
             self.clearFocus()
             self.parentWidget().setFocus()
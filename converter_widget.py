@@ -6,22 +6,43 @@ from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QPushButton, QHBoxLayo
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 
-from calculator import bgn_to_eur, eur_to_bgn
+from calculator import format_cents, to_units, units_to_bgn_cents, units_to_eur_cents
+from catalog import get_catalog, ScannerBurstDetector
+from expression import Expression, OPERATORS
+from frame_scheduler import FrameScheduler
+import diagnostics
+import theme
+
+# Keys typing an operator; x and * both mean multiplication
+OPERATOR_KEYS = {
+    Qt.Key_Plus: "+",
+    Qt.Key_Minus: "-",
+    Qt.Key_Asterisk: "×",
+    Qt.Key_X: "×",
+    Qt.Key_Slash: "÷",
+}
 
 class ConverterWidget(QWidget):
     def __init__(self, parent=None, settings=None):
         super().__init__(parent)
         self.settings = settings or {}
         self.bgn_to_eur_mode = self.settings.get("last_direction_bgn_to_eur", True)
-        self.input_value = ""
+        self.expression = Expression()
         self.minimal_mode = False
         self._open_updates_callback = None
+        self.scanner = ScannerBurstDetector()
+        self.label_updates = FrameScheduler(self.update_labels, self)  # typed keys refresh once per frame
 
         # Fonts
         self.font_big = QFont("Arial", 24, QFont.Bold)
         self.font_medium = QFont("Arial", 18)
         self.font_small = QFont("Arial", 12)
 
+        # Expression being typed, e.g. "3 × 2.49 + 12.90" (normal mode only)
+        self.expr_label = QLabel("")
+        self.expr_label.setAlignment(Qt.AlignCenter)
+        self.expr_label.setFont(self.font_small)
+
         # Input label (amount)
         self.input_label = QLabel("0.00 лв.")
         self.input_label.setAlignment(Qt.AlignCenter)
@@ -29,18 +50,7 @@ class ConverterWidget(QWidget):
 
         # Switch button
         self.switch_button = QPushButton("⇄")
-        self.switch_button.setStyleSheet("""
-            QPushButton {
-                font-size:24px;
-                color:#dddddd;
-                border:none;
-                background:#aaaaaa;
-                border-radius:16px;
-            }
-            QPushButton:hover {
-                background:#cccccc;
-            }
-        """)
+        self.switch_button.setObjectName("switchButton")  # styled by theme.py
         self.switch_button.clicked.connect(self.toggle_direction)
 
         # Output label (converted)
@@ -63,6 +73,30 @@ class ConverterWidget(QWidget):
         self.setFocus()
         self.update_labels()
 
+    @property
+    def input_value(self):
+        """The typed input, an amount or an expression such as "3×2.49+12.90"."""
+        return self.expression.text
+
+    @input_value.setter
+    def input_value(self, text):
+        self.expression.reset(text)
+
+    def amounts_cents(self):
+        """The evaluated input and its conversion as (BGN cents, EUR cents); zeros after a division by zero."""
+        cents = self.expression.cents() or 0
+        if self.bgn_to_eur_mode:
+            return cents, units_to_eur_cents(to_units(cents))
+        return units_to_bgn_cents(to_units(0, cents)), cents
+
+    def price_bgn_cents(self):
+        return self.amounts_cents()[0]
+
+    def amount_units(self):
+        """The evaluated input as an exact amount (see calculator.to_units), in the currency it was typed in."""
+        cents = self.expression.cents() or 0
+        return to_units(cents) if self.bgn_to_eur_mode else to_units(0, cents)
+
     def set_open_updates_callback(self, callback):
         self._open_updates_callback = callback
 
@@ -76,9 +110,6 @@ class ConverterWidget(QWidget):
         else:
             self.version_label.setText(f"версия {VERSION}")
 
-    def set_version_label_color(self, color):
-        self.version_label.setStyleSheet(f"color:{color};")
-
     @property
     def auto_copy_enabled(self):
         return self.settings.get("auto_copy_result", False)
@@ -107,18 +138,8 @@ class ConverterWidget(QWidget):
             self.input_label.setAlignment(Qt.AlignCenter)
             self.output_label.setAlignment(Qt.AlignCenter)
             self.switch_button.setFixedSize(32, 32)
-            self.switch_button.setStyleSheet("""
-                QPushButton {
-                    font-size:18px;
-                    color:#dddddd;
-                    border:none;
-                    background:#aaaaaa;
-                    border-radius:16px;
-                }
-                QPushButton:hover {
-                    background:#cccccc;
-                }
-            """)
+            self.switch_button.setProperty("compact", True)
+            theme.repolish(self.switch_button)
             h_layout = QHBoxLayout()
             h_layout.setContentsMargins(10, 5, 10, 5)
             h_layout.setSpacing(8)
@@ -137,18 +158,9 @@ class ConverterWidget(QWidget):
             self.input_label.setAlignment(Qt.AlignCenter)
             self.output_label.setAlignment(Qt.AlignCenter)
             self.switch_button.setFixedSize(48, 48)
-            self.switch_button.setStyleSheet("""
-                QPushButton {
-                    font-size:32px;
-                    color:#dddddd;
-                    border:none;
-                    background:#aaaaaa;
-                    border-radius:24px;
-                }
-                QPushButton:hover {
-                    background:#cccccc;
-                }
-            """)
+            self.switch_button.setProperty("compact", False)
+            theme.repolish(self.switch_button)
+            self.layout.addWidget(self.expr_label)
             self.layout.addWidget(self.input_label)
             btn_layout = QHBoxLayout()
             btn_layout.addStretch()
@@ -173,41 +185,77 @@ class ConverterWidget(QWidget):
         self.bgn_to_eur_mode = not self.bgn_to_eur_mode
         if self.remember_direction_enabled:
             self.settings["last_direction_bgn_to_eur"] = self.bgn_to_eur_mode
-            from settings import save_settings
-            save_settings(self.settings)
         self.input_value = ""
         self.update_labels()
 
+    @diagnostics.timed("update_labels")
     def update_labels(self):
-        try:
-            val = float(self.input_value) if self.input_value else 0.0
-        except ValueError:
-            val = 0.0
+        # Expression.cents() only re-evaluates the term being typed
+        cents = self.expression.cents()
+        self.expr_label.setText(self.expression.display() if self.expression.has_operators else "")
+        if cents is None:
+            self.input_label.setText("÷ 0")
+            self.output_label.setText("—")
+            return
         if self.bgn_to_eur_mode:
-            self.input_label.setText(f"{val:.2f} лв.")
-            eur = bgn_to_eur(val)
-            self.output_label.setText(f"€{eur:.2f}")
-            result_text = f"{eur:.2f}"
+            self.input_label.setText(f"{format_cents(cents)} лв.")
+            result_text = format_cents(units_to_eur_cents(to_units(cents)))
+            self.output_label.setText(f"€{result_text}")
         else:
-            self.input_label.setText(f"€{val:.2f}")
-            bgn = eur_to_bgn(val)
-            self.output_label.setText(f"{bgn:.2f} лв.")
-            result_text = f"{bgn:.2f}"
+            self.input_label.setText(f"€{format_cents(cents)}")
+            result_text = format_cents(units_to_bgn_cents(to_units(0, cents)))
+            self.output_label.setText(f"{result_text} лв.")
         if self.auto_copy_enabled:
-            QApplication.clipboard().setText(result_text)
+            with diagnostics.stage("clipboard"):
+                QApplication.clipboard().setText(result_text)
+
+    def apply_scanned_code(self, code):
+        """Replace the digits a barcode scanner typed with the product's price."""
+        snapshot = self.scanner.snapshot or ""
+        self.input_value = snapshot
+        catalog = get_catalog()
+        product = catalog.lookup(code) if catalog is not None else None
+        if product is None:
+            QApplication.beep()
+        else:
+            cents = product.price_cents
+            # Show the price in the current input currency
+            if product.currency == "EUR" and self.bgn_to_eur_mode:
+                cents = units_to_bgn_cents(to_units(0, cents))
+            elif product.currency != "EUR" and not self.bgn_to_eur_mode:
+                cents = units_to_eur_cents(to_units(cents, 0))
+            # After an operator the price becomes the next number ("3×" + scan)
+            prefix = snapshot if snapshot[-1:] in tuple(OPERATORS) else ""
+            self.input_value = prefix + format_cents(cents)
+        self.update_labels()
 
+    @diagnostics.timed("key_handler")
     def keyPressEvent(self, event):
         key = event.key()
         if Qt.Key_0 <= key <= Qt.Key_9:
-            if len(self.input_value) < 10:
-                self.input_value += event.text()
-                self.update_labels()
+            self.scanner.feed(event.text(), self.input_value)
+            if self.expression.push(event.text()):
+                self.label_updates.request()
+        elif key in (Qt.Key_Return, Qt.Key_Enter):
+            code = self.scanner.finish()
+            if code is not None:
+                self.apply_scanned_code(code)
+            else:
+                super().keyPressEvent(event)
         elif key == Qt.Key_Backspace:
-            self.input_value = self.input_value[:-1]
-            self.update_labels()
+            self.expression.pop()
+            self.label_updates.request()
         elif key in (Qt.Key_Comma, Qt.Key_Period):
-            if '.' not in self.input_value:
-                self.input_value += '.'
+            if self.expression.push("."):
+                self.label_updates.request()
+        elif key in OPERATOR_KEYS and not event.modifiers() & (Qt.ControlModifier | Qt.AltModifier):
+            if self.expression.push(OPERATOR_KEYS[key]):
+                self.label_updates.request()
+        elif key == Qt.Key_Equal:
+            # Collapse the expression into its result
+            cents = self.expression.cents()
+            if cents is not None and self.expression.has_operators:
+                self.input_value = format_cents(cents)
                 self.update_labels()
         elif key == Qt.Key_Escape:
             self.input_value = ""
@@ -0,0 +1,158 @@
+# delta.py
+#
+# Binary delta between two releases of a file (e.g. the installer).
+# A delta is a zlib-compressed stream of copy-from-source and literal ops:
+#   b"C" <u64 source offset> <u32 length>
+#   b"A" <u32 length> <bytes>
+#   b"E"
+# Create one when publishing a release:
+#   python delta.py make old_setup.exe new_setup.exe old_to_new.delta
+# The target_sha256 it prints also goes into the top-level "sha256" of
+# latest_version.json, which the updater checks while downloading.
+
+import sys
+import zlib
+import struct
+import hashlib
+
+MAGIC = b"BGNDELTA1\n"
+BLOCK_SIZE = 4096
+COPY_STRUCT = struct.Struct("<QI")
+LEN_STRUCT = struct.Struct("<I")
+IO_CHUNK = 1024 * 1024
+
+class DeltaError(Exception):
+    pass
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(IO_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _weak_hash(data):
+    a = sum(data) & 0xFFFF
+    b = sum((len(data) - i) * x for i, x in enumerate(data)) & 0xFFFF
+    return a, b
+
+def make_delta(source, target, block_size=BLOCK_SIZE):
+    """Return delta bytes that rebuild target from source (both bytes objects)."""
+    blocks = {}
+    for offset in range(0, len(source) - block_size + 1, block_size):
+        a, b = _weak_hash(source[offset:offset + block_size])
+        blocks.setdefault((b << 16) | a, []).append(offset)
+
+    ops = []
+    literal = bytearray()
+
+    def flush_literal():
+        if literal:
+            ops.append(b"A" + LEN_STRUCT.pack(len(literal)) + bytes(literal))
+            literal.clear()
+
+    def add_copy(offset, length):
+        if ops and ops[-1][:1] == b"C" and not literal:
+            prev_offset, prev_length = COPY_STRUCT.unpack(ops[-1][1:])
+            if prev_offset + prev_length == offset:
+                ops[-1] = b"C" + COPY_STRUCT.pack(prev_offset, prev_length + length)
+                return
+        flush_literal()
+        ops.append(b"C" + COPY_STRUCT.pack(offset, length))
+
+    pos = 0
+    next_source = None  # Fast path: after a match, try the following source block first
+    a = b = None
+    while pos + block_size <= len(target):
+        window = target[pos:pos + block_size]
+        if next_source is not None and source[next_source:next_source + block_size] == window:
+            add_copy(next_source, block_size)
+            next_source += block_size
+            pos += block_size
+            a = None
+            continue
+        if a is None:
+            a, b = _weak_hash(window)
+        match = None
+        for offset in blocks.get((b << 16) | a, ()):
+            if source[offset:offset + block_size] == window:
+                match = offset
+                break
+        if match is not None:
+            add_copy(match, block_size)
+            next_source = match + block_size
+            pos += block_size
+            a = None
+            continue
+        # Roll the weak hash forward by one byte
+        out_byte = target[pos]
+        literal.append(out_byte)
+        next_source = None
+        pos += 1
+        if pos + block_size <= len(target):
+            in_byte = target[pos + block_size - 1]
+            a = (a - out_byte + in_byte) & 0xFFFF
+            b = (b - block_size * out_byte + a) & 0xFFFF
+    literal.extend(target[pos:])
+    flush_literal()
+    ops.append(b"E")
+    return MAGIC + zlib.compress(b"".join(ops), 6)
+
+def apply_delta(source_path, delta_path, out_path):
+    """
+    Rebuild the target file at out_path from source_path and a delta file.
+    Returns the sha256 hex digest of the output, hashed as it is written.
+    """
+    with open(delta_path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise DeltaError("Невалиден файл с разлики.")
+    try:
+        ops = zlib.decompress(data[len(MAGIC):])
+    except zlib.error as e:
+        raise DeltaError(f"Повреден файл с разлики: {e}")
+    view = memoryview(ops)
+    pos = 0
+    h = hashlib.sha256()
+    with open(source_path, "rb") as src, open(out_path, "wb") as out:
+        while True:
+            op = ops[pos:pos + 1]
+            pos += 1
+            if op == b"C":
+                offset, length = COPY_STRUCT.unpack_from(ops, pos)
+                pos += COPY_STRUCT.size
+                src.seek(offset)
+                while length:
+                    chunk = src.read(min(length, IO_CHUNK))
+                    if not chunk:
+                        raise DeltaError("Инсталираният файл е по-къс от очакваното.")
+                    out.write(chunk)
+                    h.update(chunk)
+                    length -= len(chunk)
+            elif op == b"A":
+                (length,) = LEN_STRUCT.unpack_from(ops, pos)
+                pos += LEN_STRUCT.size
+                out.write(view[pos:pos + length])
+                h.update(view[pos:pos + length])
+                pos += length
+            elif op == b"E":
+                return h.hexdigest()
+            else:
+                raise DeltaError("Повреден файл с разлики.")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5 or sys.argv[1] != "make":
+        print("usage: python delta.py make OLD NEW OUT")
+        sys.exit(1)
+    _, _, old_path, new_path, out_path = sys.argv
+    with open(old_path, "rb") as f:
+        old = f.read()
+    with open(new_path, "rb") as f:
+        new = f.read()
+    delta = make_delta(old, new)
+    with open(out_path, "wb") as f:
+        f.write(delta)
+    print(f"source_sha256: {file_sha256(old_path)}")
+    print(f"target_sha256: {file_sha256(new_path)}")
+    print(f"sha256: {file_sha256(out_path)}")
+    print(f"size: {len(delta)} bytes ({len(delta) * 100 / max(1, len(new)):.1f}% of {len(new)})")
@@ -0,0 +1,198 @@
+# diagnostics.py
+#
+# Opt-in latency histograms for the key press -> repaint path. Stages nest
+# (event_filter contains key_handler, which contains update_labels and
+# clipboard), so each one is an inclusive time. When recording is off
+# every hook is a single flag check.
+# memory_usage() reports the resident set for the same view.
+
+import sys
+import json
+import math
+import time
+import functools
+
+STAGES = ("event_filter", "key_handler", "update_labels", "clipboard", "paint", "key_to_paint")
+BUCKETS_PER_OCTAVE = 4  # ~19% wide buckets
+BUCKET_COUNT = 100  # 1 us .. ~33 s
+KEY_PAINT_TIMEOUT = 0.5  # a key with no repaint within this is not counted
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with a fixed number of counters."""
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        index = int(math.log2(us) * BUCKETS_PER_OCTAVE) if us > 1 else 0
+        self.counts[min(index, BUCKET_COUNT - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound in ms of the bucket holding the q-th (0..1) sample."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                upper_us = 2 ** ((index + 1) / BUCKETS_PER_OCTAVE)
+                return min(upper_us / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max * 1000,
+        }
+
+_enabled = False
+_histograms = {name: LatencyHistogram() for name in STAGES}
+_key_time = None
+
+def set_enabled(enabled):
+    global _enabled, _key_time
+    _enabled = bool(enabled)
+    _key_time = None
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    for name in STAGES:
+        _histograms[name] = LatencyHistogram()
+
+def record(stage, seconds):
+    if _enabled:
+        _histograms[stage].add(seconds)
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        _histograms[self.name].add(time.perf_counter() - self.start)
+
+class _NoStage:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_STAGE = _NoStage()
+
+def stage(name):
+    """Context manager timing a block as stage name (a shared no-op when off)."""
+    return _Stage(name) if _enabled else _NO_STAGE
+
+def timed(name):
+    """Decorator timing every call of a function as stage name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _histograms[name].add(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def key_pressed():
+    """Start the key_to_paint clock; keys arriving before the next paint share it."""
+    global _key_time
+    if _enabled and _key_time is None:
+        _key_time = time.perf_counter()
+
+def painted():
+    """Stop the key_to_paint clock at the end of an AppWindow paint."""
+    global _key_time
+    if _key_time is not None:
+        elapsed = time.perf_counter() - _key_time
+        _key_time = None
+        if _enabled and elapsed < KEY_PAINT_TIMEOUT:
+            _histograms["key_to_paint"].add(elapsed)
+
+def _windows_memory():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi = ctypes.windll.psapi
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None, None
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+def memory_usage():
+    """(current, peak) resident memory of this process in bytes; None where unknown."""
+    try:
+        if sys.platform == "win32":
+            return _windows_memory()
+        values = {}
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    values[line[:5]] = int(line.split()[1]) * 1024
+        return values.get("VmRSS"), values.get("VmHWM")
+    except Exception:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return None, peak if sys.platform == "darwin" else peak * 1024
+        except Exception:
+            return None, None
+
+def summaries():
+    return {name: _histograms[name].summary() for name in STAGES}
+
+def export_json(path, extra=None):
+    """Write summaries plus raw bucket counts, enough to re-plot offline."""
+    data = {
+        "exported_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "bucket_upper_us": [2 ** ((i + 1) / BUCKETS_PER_OCTAVE) for i in range(BUCKET_COUNT)],
+        "stages": {
+            name: dict(_histograms[name].summary(), buckets=_histograms[name].counts) for name in STAGES
+        },
+    }
+    if extra:
+        data.update(extra)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    return path
@@ -2,49 +2,34 @@ from version import VERSION
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QCheckBox, QLabel, QComboBox, QPushButton, QSpacerItem, QSizePolicy,
-    QTabWidget, QTextBrowser, QDialog, QApplication  # <-- Add QApplication here
+    QTabWidget, QTextBrowser, QDialog, QApplication, QLineEdit, QTextEdit, QFileDialog, QDateEdit
 )
-from PyQt5.QtCore import Qt, QRectF, QTimer
-from PyQt5.QtGui import QCursor, QPainter, QPainterPath, QBrush, QColor
-
-from settings import get_theme, save_settings
+from PyQt5.QtCore import Qt, QTimer, QDate
+from PyQt5.QtGui import QCursor, QTextCursor, QTextCharFormat, QColor
+from PyQt5 import sip
+
+from background import RoundedBackground
+
+from settings import get_theme, get_user_settings_path
+from docs import doc_path, load_markdown_html
+from doc_search import load_index
+import diagnostics
+import idle_trim
+import theme
+import till_log
+import sync_agent
+import receipt
+import tasks
+import catalog
+import rate_store
+from calculator import parse_cents, format_cents, to_units, units_to_bgn_cents
 import sys
 import os
-import markdown
-
-def doc_path(filename):
-    base = os.path.dirname(os.path.abspath(sys.argv[0]))
-    return os.path.join(base, "Documentation", filename)
-
-def load_markdown_html(filepath, theme="light"):
-    try:
-        with open(filepath, encoding="utf-8") as f:
-            md_text = f.read()
-        html = markdown.markdown(md_text, extensions=["extra", "tables", "sane_lists"])
-    except Exception:
-        html = "<i>Документът не е наличен.</i>"
-    if theme == "dark":
-        css = """
-        <style>
-        body { background: #333333; color: #e0e0e0; font-family: Arial, sans-serif; }
-        h1, h2, h3, h4, h5 { color: #fafafa; }
-        code, pre { background: #181a20; color: #fff; border-radius: 4px; padding: 1px 4px; }
-        a { color: #8ab4f8; }
-        ul, ol { margin-left: 20px; }
-        </style>
-        """
-    else:
-        css = """
-        <style>
-        body { background: #fafafa; color: #2b2b2b; font-family: Arial, sans-serif; }
-        h1, h2, h3, h4, h5 { color: #222; }
-        code, pre { background: #f1f1f1; color: #222; border-radius: 4px; padding: 1px 4px; }
-        a { color: #1a0dab; }
-        ul, ol { margin-left: 20px; }
-        </style>
-        """
-    html = css + html
-    return html
+import time
+
+DOC_LOADING_HTML = "<i>Зареждане...</i>"
+MAX_HIGHLIGHTS = 200
+MIN_HIGHLIGHT_LENGTH = 2  # characters in the query before matches are highlighted
 
 class SettingsTab(QWidget):
     def __init__(self, app_settings, on_settings_changed, parent_window=None, update_info=None, manual_update_callback=None):
@@ -97,10 +82,8 @@ class SettingsTab(QWidget):
         self.updates_layout = QVBoxLayout(self.updates_block)
         self.updates_layout.setContentsMargins(14, 10, 14, 10)
         self.updates_layout.setSpacing(8)
-        self.updates_block.setStyleSheet("""
-            background: rgba(64,68,80,0.08);
-            border-radius: 12px;
-        """)
+        self.updates_block.setObjectName("updatesBlock")
+        self.updates_block.setAttribute(Qt.WA_StyledBackground, True)
         layout.addWidget(self.updates_block)
 
         self.chk_auto_check_updates = QCheckBox("Автоматична проверка за обновления")
@@ -113,17 +96,18 @@ class SettingsTab(QWidget):
 
         self.manual_check_btn = QPushButton("Провери за обновления")
         self.manual_check_btn.setCursor(Qt.PointingHandCursor)
+        self.manual_check_btn.setProperty("role", "update")
         self.manual_check_btn.clicked.connect(self.do_manual_update)
         self.updates_layout.addWidget(self.manual_check_btn)
 
         self.no_update_label = QLabel("")
         self.no_update_label.setVisible(False)
-        self.no_update_label.setStyleSheet("font-size:12px;")
+        self.no_update_label.setObjectName("noUpdateLabel")
         self.updates_layout.addWidget(self.no_update_label)
 
         self.lbl_latest = QLabel("")
         self.lbl_latest.setVisible(False)
-        self.lbl_latest.setStyleSheet("font-weight: bold")
+        self.lbl_latest.setObjectName("latestLabel")
         self.updates_layout.addWidget(self.lbl_latest)
 
         self.changelog_label = QLabel()
@@ -134,26 +118,87 @@ class SettingsTab(QWidget):
         self.download_button = QPushButton("Изтегли и инсталирай")
         self.download_button.setVisible(False)
         self.download_button.setCursor(Qt.PointingHandCursor)
+        self.download_button.setProperty("role", "update")
         self.download_button.clicked.connect(self.launch_downloader)
         self.updates_layout.addWidget(self.download_button)
 
+        # Data files imported from the back office; the imports run on the task pool
+        self.data_block = QWidget()
+        self.data_layout = QVBoxLayout(self.data_block)
+        self.data_layout.setContentsMargins(14, 6, 14, 6)
+        self.data_layout.setSpacing(4)
+        self.data_block.setObjectName("dataBlock")
+        self.data_block.setAttribute(Qt.WA_StyledBackground, True)
+        layout.addWidget(self.data_block)
+
+        catalog_row = QHBoxLayout()
+        self.catalog_label = QLabel("Ценоразпис: ...")
+        catalog_row.addWidget(self.catalog_label, 1)
+        self.catalog_btn = QPushButton("Импорт CSV...")
+        self.catalog_btn.setCursor(Qt.PointingHandCursor)
+        self.catalog_btn.setMinimumHeight(26)
+        self.catalog_btn.clicked.connect(self.import_catalog)
+        catalog_row.addWidget(self.catalog_btn)
+        self.data_layout.addLayout(catalog_row)
+        self.catalog_note = QLabel("")
+        self.catalog_note.setProperty("role", "note")
+        self.catalog_note.hide()
+        self.data_layout.addWidget(self.catalog_note)
+        self.catalog_task = tasks.submit("catalog_count", catalog.product_count, on_result=self._show_catalog_count)
+
+        # Historical ECB rates for checking old invoices: amount in a currency on a date -> EUR and BGN
+        rates_row = QHBoxLayout()
+        self.rates_label = QLabel("Курсове: ...")
+        rates_row.addWidget(self.rates_label, 1)
+        self.rates_btn = QPushButton("Импорт...")
+        self.rates_btn.setCursor(Qt.PointingHandCursor)
+        self.rates_btn.setMinimumHeight(26)
+        self.rates_btn.clicked.connect(self.import_rates)
+        rates_row.addWidget(self.rates_btn)
+        self.data_layout.addLayout(rates_row)
+
+        lookup_row = QHBoxLayout()
+        self.rate_date = QDateEdit(QDate.currentDate())
+        self.rate_date.setDisplayFormat("dd.MM.yyyy")
+        self.rate_date.setCalendarPopup(True)
+        self.rate_date.dateChanged.connect(self.update_rate_lookup)
+        lookup_row.addWidget(self.rate_date)
+        self.rate_currency = QComboBox()
+        self.rate_currency.currentIndexChanged.connect(self.update_rate_lookup)
+        lookup_row.addWidget(self.rate_currency)
+        self.rate_amount = QLineEdit("100")
+        self.rate_amount.setPlaceholderText("Сума")
+        self.rate_amount.textChanged.connect(self.update_rate_lookup)
+        lookup_row.addWidget(self.rate_amount)
+        self.data_layout.addLayout(lookup_row)
+        self.rate_result = QLabel("")
+        self.rate_result.setProperty("role", "note")
+        self.rate_result.setWordWrap(True)
+        self.data_layout.addWidget(self.rate_result)
+        self.rate_store = None
+        self._set_rates_enabled(False)
+        self.rates_task = tasks.submit("rates_open", rate_store.load_store, on_result=self._rates_opened,
+                                       on_error=self._rates_failed)
+
         layout.addItem(QSpacerItem(10, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
         self.setLayout(layout)
         self.update_updates_block()
-        self.apply_theme(get_theme(self.app_settings))
+        self._subscriptions = [
+            self.app_settings.subscribe(["auto_check_updates"], lambda changes: self.update_updates_block()),
+        ]
 
     def save_settings(self):
-        self.app_settings["start_with_windows"] = self.chk_start_windows.isChecked()
-        self.app_settings["start_minimized"] = self.chk_start_minimized.isChecked()
-        self.app_settings["theme"] = self.theme_combo.currentIndex()
-        self.app_settings["auto_check_updates"] = self.chk_auto_check_updates.isChecked()
-        self.app_settings["auto_copy_result"] = self.chk_auto_copy_result.isChecked()
-        self.app_settings["remember_last_direction"] = self.chk_remember_last_direction.isChecked()
-        if self.on_settings_changed:
+        # The settings model diffs these and notifies only the subscribers of changed keys
+        changes = self.app_settings.update({
+            "start_with_windows": self.chk_start_windows.isChecked(),
+            "start_minimized": self.chk_start_minimized.isChecked(),
+            "theme": self.theme_combo.currentIndex(),
+            "auto_check_updates": self.chk_auto_check_updates.isChecked(),
+            "auto_copy_result": self.chk_auto_copy_result.isChecked(),
+            "remember_last_direction": self.chk_remember_last_direction.isChecked(),
+        })
+        if changes and self.on_settings_changed:
             self.on_settings_changed(self.app_settings)
-        if self.parent_window:
-            self.parent_window.apply_theme(get_theme(self.app_settings))
-        self.update_updates_block()
 
     def launch_downloader(self):
         try:
@@ -199,32 +244,288 @@ class SettingsTab(QWidget):
             self.no_update_label.setText("Няма налични нови обновления.")
             self.no_update_label.setVisible(True)
 
-    def apply_theme(self, theme):
-        if theme == "dark":
-            self.no_update_label.setStyleSheet("font-size:12px; color:#eeeeee;")
-            btn_style = (
-                "QPushButton { background: #313640; color: #eee; border-radius: 8px; font-size: 15px; padding: 10px 0; }"
-                "QPushButton:hover { background: #374151; }"
-                "QPushButton:pressed { background: #2d3848; }"
-            )
-            self.updates_block.setStyleSheet("background: rgba(64,68,80,0.13); border-radius: 12px;")
-        else:
-            self.no_update_label.setStyleSheet("font-size:12px; color:#000000;")
-            btn_style = (
-                "QPushButton { background: #e8e8e8; color: #223; border-radius: 8px; font-size: 15px; padding: 10px 0; }"
-                "QPushButton:hover { background: #d4d4d4; }"
-                "QPushButton:pressed { background: #c3c3c3; }"
-            )
-            self.updates_block.setStyleSheet("background: rgba(64,68,80,0.08); border-radius: 12px;")
-        self.manual_check_btn.setStyleSheet(btn_style)
-        self.download_button.setStyleSheet(btn_style)
-
     def do_manual_update(self):
         if self.manual_update_callback:
-            info = self.manual_update_callback()
-            self.update_info = info
-            self.last_manual_check = True
-            self.update_updates_block()
+            self.manual_check_btn.setEnabled(False)
+            self.manual_check_btn.setText("Проверка...")
+            self.manual_update_callback(on_done=self._manual_update_done)
+
+    def _manual_update_done(self, info):
+        self.manual_check_btn.setEnabled(True)
+        self.manual_check_btn.setText("Провери за обновления")
+        self.update_info = info
+        self.last_manual_check = True
+        self.update_updates_block()
+
+    def _show_catalog_count(self, count):
+        self.catalog_label.setText(f"Ценоразпис: {count} арт." if count else "Ценоразпис: няма")
+
+    def import_catalog(self):
+        """Pick a barcode,name,price[,currency] CSV and import it in the background."""
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт на ценоразпис", "", "CSV (*.csv);;Всички файлове (*)")
+        if not path:
+            return
+        self.catalog_btn.setEnabled(False)
+        self.catalog_label.setText("Импортиране...")
+        self.catalog_task = tasks.submit(
+            "catalog_import", self._import_catalog_file, path,
+            on_progress=lambda percent: self.catalog_label.setText(f"Импортиране... {percent}%"),
+            on_result=self._catalog_imported,
+            on_error=self._catalog_failed,
+        )
+
+    @staticmethod
+    def _import_catalog_file(path):
+        """Runs on the task pool."""
+        return catalog.import_file(path, on_progress=tasks.current_task().report)
+
+    def _catalog_imported(self, result):
+        count, rejected, total = result
+        catalog.reload()
+        self.catalog_btn.setEnabled(True)
+        self.catalog_label.setText(f"Ценоразпис: {total} арт.")
+        self.catalog_note.setText(f"Импортирани {count} реда; пропуснати с невалидна цена: {rejected}")
+        self.catalog_note.setVisible(bool(rejected))
+
+    def _catalog_failed(self, error):
+        self.catalog_btn.setEnabled(True)
+        self.catalog_label.setText(f"Грешка при импорта: {error}")
+
+    def _set_rates_enabled(self, enabled):
+        for widget in (self.rate_date, self.rate_currency, self.rate_amount):
+            widget.setEnabled(enabled)
+
+    def _rates_opened(self, store):
+        self.close_rates()
+        self.rate_store = store
+        self.rates_btn.setEnabled(True)
+        if store is None:
+            self.rates_label.setText("Курсове: няма")
+            self.rate_result.setText("Импортирайте eurofxref-hist.xml или .csv от сайта на ЕЦБ.")
+            return
+        first, last = store.first_date, store.last_date
+        self.rates_label.setText(f"Курсове: {first:%d.%m.%Y} – {last:%d.%m.%Y}")
+        self.rate_date.setDateRange(QDate(first.year, first.month, first.day), QDate(last.year, last.month, last.day))
+        current = self.rate_currency.currentText() or "USD"
+        self.rate_currency.blockSignals(True)
+        self.rate_currency.clear()
+        self.rate_currency.addItems([code for code in store.currencies if code != "BGN"])
+        self.rate_currency.setCurrentIndex(max(0, self.rate_currency.findText(current)))
+        self.rate_currency.blockSignals(False)
+        self._set_rates_enabled(True)
+        self.update_rate_lookup()
+
+    def _rates_failed(self, error):
+        self.rates_btn.setEnabled(True)
+        self.rates_label.setText("Курсове: грешка")
+        self.rate_result.setText(str(error))
+
+    def close_rates(self):
+        """Unmap the rate file (an import replaces it; Windows cannot replace a mapped file)."""
+        if self.rate_store is not None:
+            self.rate_store.close()
+            self.rate_store = None
+            self._set_rates_enabled(False)
+
+    def import_rates(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт на курсове на ЕЦБ", "",
+                                              "Курсове на ЕЦБ (*.xml *.csv);;Всички файлове (*)")
+        if not path:
+            return
+        self.close_rates()
+        self.rates_btn.setEnabled(False)
+        self.rates_label.setText("Импортиране...")
+        self.rates_task = tasks.submit("rates_import", self._import_rates_file, path,
+                                       on_result=self._rates_opened, on_error=self._rates_failed)
+
+    @staticmethod
+    def _import_rates_file(path):
+        """Runs on the task pool; returns the reopened store."""
+        rate_store.import_rates(path)
+        return rate_store.RateStore()
+
+    def update_rate_lookup(self):
+        """Amount in the chosen currency on the chosen date, in EUR (ECB rate) and BGN (fixed rate)."""
+        if self.rate_store is None or not self.rate_currency.currentText():
+            return
+        currency = self.rate_currency.currentText()
+        date = self.rate_date.date().toPyDate()
+        amount_cents = parse_cents(self.rate_amount.text().strip().replace(",", "."))
+        try:
+            effective, rate = self.rate_store.rate_at(currency, date)
+        except rate_store.RateError as e:
+            self.rate_result.setText(str(e))
+            return
+        eur_cents = round(amount_cents / rate)
+        bgn_cents = units_to_bgn_cents(to_units(0, eur_cents))
+        self.rate_result.setText(
+            f"{format_cents(amount_cents)} {currency} = €{format_cents(eur_cents)} = {format_cents(bgn_cents)} лв."
+            f"  (1 EUR = {rate:g} {currency}, {effective:%d.%m.%Y})"
+        )
+
+STAGE_TITLES = {
+    "event_filter": "Общи клавиши",
+    "key_handler": "Обработка на клавиш",
+    "update_labels": "Опресняване на сумите",
+    "clipboard": "Клипборд",
+    "paint": "Рисуване на фона",
+    "key_to_paint": "Клавиш → екран",
+}
+
+class DiagnosticsTab(QWidget):
+    def __init__(self, app_settings, app_window=None):
+        super().__init__()
+        self.app_settings = app_settings
+        self.app_window = app_window
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(16, 16, 16, 16)
+
+        self.chk_enabled = QCheckBox("Измервай времето за реакция")
+        self.chk_enabled.setChecked(app_settings.get("diagnostics_enabled", False))
+        self.chk_enabled.stateChanged.connect(self.save_settings)
+        layout.addWidget(self.chk_enabled)
+
+        self.chk_profiling = QCheckBox("Профилиране с извадки (след рестарт)")
+        self.chk_profiling.setChecked(app_settings.get("profiling_enabled", False))
+        self.chk_profiling.stateChanged.connect(self.save_settings)
+        layout.addWidget(self.chk_profiling)
+
+        self.table_label = QLabel()
+        self.table_label.setTextFormat(Qt.RichText)
+        layout.addWidget(self.table_label)
+
+        self.background_label = QLabel()
+        self.background_label.setProperty("role", "note")
+        layout.addWidget(self.background_label)
+
+        self.memory_label = QLabel()
+        self.memory_label.setWordWrap(True)
+        self.memory_label.setProperty("role", "note")
+        layout.addWidget(self.memory_label)
+
+        buttons = QHBoxLayout()
+        self.refresh_btn = QPushButton("Обнови")
+        self.refresh_btn.clicked.connect(self.refresh)
+        buttons.addWidget(self.refresh_btn)
+        self.reset_btn = QPushButton("Изчисти")
+        self.reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(self.reset_btn)
+        self.export_btn = QPushButton("Експорт (JSON)")
+        self.export_btn.clicked.connect(self.export)
+        buttons.addWidget(self.export_btn)
+        for btn in (self.refresh_btn, self.reset_btn, self.export_btn):
+            btn.setCursor(Qt.PointingHandCursor)
+            btn.setMinimumHeight(30)
+        layout.addLayout(buttons)
+
+        self.status_label = QLabel("")
+        self.status_label.setWordWrap(True)
+        self.status_label.setProperty("role", "note")
+        layout.addWidget(self.status_label)
+
+        layout.addItem(QSpacerItem(10, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
+        self._subscriptions = [
+            self.app_settings.subscribe(["diagnostics_enabled"], lambda changes: self.chk_enabled.setChecked(changes[-1].new)),
+        ]
+        self.refresh()
+
+    def save_settings(self):
+        self.app_settings.update({
+            "diagnostics_enabled": self.chk_enabled.isChecked(),
+            "profiling_enabled": self.chk_profiling.isChecked(),
+        })
+
+    def _background_stats(self):
+        background = getattr(self.app_window, "background", None)
+        return background.stats() if background is not None else None
+
+    def refresh(self):
+        rows = "".join(
+            f"<tr><td>{STAGE_TITLES[name]}</td><td align='right'>{s['count']}</td>"
+            f"<td align='right'>{s['p50_ms']:.2f}</td><td align='right'>{s['p95_ms']:.2f}</td>"
+            f"<td align='right'>{s['p99_ms']:.2f}</td></tr>"
+            for name, s in diagnostics.summaries().items()
+        )
+        self.table_label.setText(
+            "<table cellspacing='0' cellpadding='3'>"
+            "<tr><th align='left'>Етап (ms)</th><th>бр.</th><th>p50</th><th>p95</th><th>p99</th></tr>"
+            f"{rows}</table>"
+        )
+        stats = self._background_stats()
+        if stats:
+            self.background_label.setText(
+                f"Фон: {stats['paints']} рисувания, {stats['renders']} пълни "
+                f"({stats['avg_blit_ms']:.2f} ms копиране, {stats['avg_render_ms']:.2f} ms изграждане)"
+            )
+        self.memory_label.setText(self._memory_text() + self._sync_text() + self._printer_text() + self._tasks_text())
+        if not diagnostics.is_enabled():
+            self.status_label.setText("Измерването е изключено и не натоварва приложението.")
+        else:
+            self.status_label.setText("")
+
+    def _memory_text(self):
+        mb = 1024 * 1024
+        current, peak = diagnostics.memory_usage()
+        text = "Памет: " + (f"{current / mb:.1f} MB" if current else "—")
+        if peak:
+            text += f" (пик {peak / mb:.1f} MB)"
+        trim = idle_trim.last_trim
+        if trim and trim["rss_before"] and trim["rss_after"]:
+            at = time.strftime("%H:%M", time.localtime(trim["time"]))
+            text += (f"\nОсвобождаване при бездействие ({at}): "
+                     f"{trim['rss_before'] / mb:.1f} → {trim['rss_after'] / mb:.1f} MB")
+        return text
+
+    def _sync_text(self):
+        agent = sync_agent.current()
+        if agent is None:
+            return ""
+        text = f"\nСинхронизация ({agent.till_id}): изпратени {agent.offset // 1024} KB"
+        if agent.last_sync:
+            text += ", последно " + time.strftime("%H:%M", time.localtime(agent.last_sync))
+        if agent.last_error:
+            text += f"\nГрешка при синхронизация: {agent.last_error}"
+        log = till_log.current()
+        if log is not None and log.dropped:
+            text += f"\nПропуснати записи: {log.dropped}"
+        return text
+
+    def _tasks_text(self):
+        timings = tasks.get_executor().timing_summaries()
+        if not timings:
+            return ""
+        parts = [f"{name} {t['count']}× {t['mean_run_ms']:.0f} ms" for name, t in sorted(timings.items())]
+        return "\nФонови задачи: " + ", ".join(parts)
+
+    def _printer_text(self):
+        printer = receipt.current()
+        if printer is None:
+            return ""
+        text = f"\nПринтер: {printer.printed} бележки"
+        if printer.last_error:
+            text += f", грешка: {printer.last_error}"
+        return text
+
+    def reset(self):
+        diagnostics.reset()
+        self.refresh()
+
+    def export(self):
+        default = os.path.join(os.path.dirname(get_user_settings_path()), "diagnostics.json")
+        path, _ = QFileDialog.getSaveFileName(self, "Експорт на измерванията", default, "JSON (*.json)")
+        if not path:
+            return
+        try:
+            diagnostics.export_json(path, extra={
+                "version": VERSION,
+                "background": self._background_stats(),
+                "tasks": tasks.get_executor().timing_summaries(),
+            })
+            self.status_label.setText(f"Записано в {path}")
+        except OSError as e:
+            self.status_label.setText(f"Грешка при запис: {e}")
 
 class InfoDialog(QDialog):
     def __init__(self, parent=None, app_settings=None, on_settings_changed=None, update_info=None, manual_update_callback=None):
@@ -235,12 +536,12 @@ class InfoDialog(QDialog):
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.theme = get_theme(app_settings)
         self.update_info = update_info
+        self.background = RoundedBackground(24)
+        self._anchor = None
 
+        self.setObjectName("infoDialog")  # scope of the theme.py rules
+        theme.attach(self)
         self.tabs = QTabWidget(self)
-        self.tabs.setStyleSheet("""
-            QTabBar::tab { height: 28px; width: 140px; font-size: 13px; }
-            QTabWidget::pane { border: none; background: transparent; }
-        """)
 
         self.settings_tab = SettingsTab(
             app_settings, on_settings_changed, parent_window=self,
@@ -248,28 +549,162 @@ class InfoDialog(QDialog):
         )
         self.tabs.addTab(self.settings_tab, "Настройки")
 
-        self.help_browser = QTextBrowser()
-        self.help_browser.setOpenExternalLinks(True)
-        help_html = load_markdown_html(doc_path("help_bg.md"), self.theme)
-        self.help_browser.setHtml(help_html)
-        self.tabs.addTab(self.help_browser, "Помощ")
-
-        self.about_browser = QTextBrowser()
-        self.about_browser.setOpenExternalLinks(True)
-        about_html = load_markdown_html(doc_path("about_bg.md"), self.theme)
-        self.about_browser.setHtml(about_html)
-        self.tabs.addTab(self.about_browser, "За приложението")
+        # Help/About browsers are only built the first time their tab is selected
+        self.help_browser = None
+        self.about_browser = None
+        self._doc_tabs = {}
+        self._doc_tasks = {}
+        self._doc_index = None
+        self.search_box = None
+        self._add_doc_tab("help_browser", "help_bg.md", "Помощ")
+        self._add_doc_tab("about_browser", "about_bg.md", "За приложението")
+        self.diagnostics_tab = DiagnosticsTab(app_settings)
+        self.tabs.addTab(self.diagnostics_tab, "Диагностика")
+        self.tabs.currentChanged.connect(self._ensure_tab_built)
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(18, 18, 18, 18)
         layout.setSpacing(0)
         layout.addWidget(self.tabs)
         self.setLayout(layout)
+        self._applied_theme = None
+        self.anchor = parent
         self.apply_theme(self.theme)
+        self.app_settings = app_settings
+        self._subscriptions = [
+            app_settings.subscribe(["theme"], lambda changes: self.apply_theme(get_theme(app_settings))),
+        ]
+
+    @property
+    def anchor(self):
+        """The register window the dialog opens next to and reports diagnostics for."""
+        return self._anchor
+
+    @anchor.setter
+    def anchor(self, window):
+        self._anchor = window
+        self.diagnostics_tab.app_window = window
+
+    def release(self):
+        """Drop the settings subscriptions and free the dialog; main builds a new one when needed."""
+        QApplication.instance().removeEventFilter(self)
+        self.hide()
+        self.settings_tab.close_rates()
+        for tab in (self, self.settings_tab, self.diagnostics_tab):
+            for subscription in tab._subscriptions:
+                self.app_settings.unsubscribe(subscription)
+        self.deleteLater()
+
+    def _add_doc_tab(self, attr, filename, title):
+        container = QWidget()
+        container_layout = QVBoxLayout(container)
+        container_layout.setContentsMargins(0, 0, 0, 0)
+        index = self.tabs.addTab(container, title)
+        self._doc_tabs[index] = (attr, filename, container_layout)
+
+    def _ensure_tab_built(self, index):
+        if self.tabs.widget(index) is self.diagnostics_tab:
+            self.diagnostics_tab.refresh()
+        if index not in self._doc_tabs:
+            return
+        attr, filename, container_layout = self._doc_tabs[index]
+        if getattr(self, attr) is not None:
+            return
+        if attr == "help_browser":
+            self._build_search_row(container_layout)
+        browser = QTextBrowser()
+        browser.setOpenExternalLinks(True)
+        container_layout.addWidget(browser)
+        setattr(self, attr, browser)
+        self._theme_browser(browser, filename, self.theme)
+
+    def _build_search_row(self, container_layout):
+        row = QHBoxLayout()
+        row.setContentsMargins(0, 6, 0, 6)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Търсене в помощта...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_docs)
+        row.addWidget(self.search_box)
+        self.search_status = QLabel("")
+        row.addWidget(self.search_status)
+        container_layout.addLayout(row)
+
+    def search_docs(self, text):
+        if self._doc_index is None:
+            self._doc_index = load_index()
+        words, counts = self._doc_index.search(text)
+        browser = self.help_browser
+        document = browser.document()
+        if "help_bg.md" not in self._doc_index.positions:
+            block = document.begin()
+            blocks = []
+            while block.isValid():
+                blocks.append((block.position(), block.text()))
+                block = block.next()
+            self._doc_index.index_positions("help_bg.md", blocks)
+        # A single letter matches most of the page; only the counts are shown for it
+        spans = self._doc_index.locate("help_bg.md", words, MAX_HIGHLIGHTS) if len(text.strip()) >= MIN_HIGHLIGHT_LENGTH else []
+        highlight = QTextCharFormat()
+        highlight.setBackground(QColor("#ffd54f"))
+        highlight.setForeground(QColor("#222222"))
+        selections = []
+        for position, length in spans:
+            cursor = QTextCursor(document)
+            cursor.setPosition(position)
+            cursor.setPosition(position + length, QTextCursor.KeepAnchor)
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = cursor
+            selection.format = highlight
+            selections.append(selection)
+        browser.setExtraSelections(selections)
+        if spans:
+            first = QTextCursor(document)
+            first.setPosition(spans[0][0])
+            browser.setTextCursor(first)
+            browser.ensureCursorVisible()
+        if not text.strip():
+            self.search_status.setText("")
+        else:
+            status = f"{counts.get('help_bg.md', 0)} реда"
+            other = sum(n for name, n in counts.items() if name != "help_bg.md")
+            if other:
+                status += f" (+{other} в „За приложението“)"
+            self.search_status.setText(status)
+
+    def _theme_browser(self, browser, filename, theme_name):
+        # Rendered on the task pool; a browser keeps its current page until the new one arrives
+        pending = self._doc_tasks.get(filename)
+        if pending is not None:
+            pending.cancel()
+        if browser.document().isEmpty():
+            browser.setHtml(DOC_LOADING_HTML)
+        self._doc_tasks[filename] = tasks.submit(
+            "load_doc", load_markdown_html, doc_path(filename), theme_name,
+            priority=tasks.PRIORITY_HIGH,
+            on_result=lambda html: self._show_doc(browser, filename, html),
+        )
+
+    def _show_doc(self, browser, filename, html):
+        if sip.isdeleted(browser):
+            return
+        self._doc_tasks.pop(filename, None)
+        browser.setHtml(html)
+        if self._doc_index is not None:
+            self._doc_index.positions.pop(filename, None)  # word positions are per rendering
+        if browser is self.help_browser and self.search_box is not None and self.search_box.text():
+            self.search_docs(self.search_box.text())
+
+    def refresh(self, update_info=None):
+        """Bring a reused dialog up to date instead of rebuilding it."""
+        self.update_info = update_info
+        self.settings_tab.update_info = update_info
+        self.settings_tab.update_updates_block()
 
     def showEvent(self, event):
-        if self.parent() and self.parent().isVisible():
-            parent_geom = self.parent().frameGeometry()
+        anchor = self.anchor
+        if anchor and anchor.isVisible():
+            parent_geom = anchor.frameGeometry()
             screen_geom = QApplication.desktop().screenGeometry(parent_geom.center())
             popup_height = self.height()
             below_top = parent_geom.bottom()
@@ -300,74 +735,28 @@ class InfoDialog(QDialog):
         super().closeEvent(event)
 
     def eventFilter(self, obj, event):
-        if event.type() == event.MouseButtonPress:
+        if event.type() == event.MouseButtonPress and QApplication.activeModalWidget() is None:
+            # Clicks outside close the dialog, but not those in a file dialog opened from it
             if not self.geometry().contains(event.globalPos()):
                 self.close()
                 return True
         return super().eventFilter(obj, event)
 
-    def apply_theme(self, theme):
-        if theme == "dark":
-            bg = "#333333"
-            fg = "#e0e0e0"
-            border = "#393939"
-        else:
-            bg = "#fafafa"
-            fg = "#2b2b2b"
-            border = "#cccccc"
-        self.setStyleSheet(f"""
-            QDialog {{
-                background: {bg};
-                color: {fg};
-                border-radius: 24px;
-            }}
-            QLabel, QCheckBox, QComboBox {{
-                color: {fg};
-                background: transparent;
-            }}
-            QTabWidget::pane {{
-                background: transparent;
-            }}
-            QTabBar::tab {{
-                background: {bg};
-                color: {fg};
-                border-radius: 8px 8px 0 0;
-                min-width: 120px;
-                padding: 8px 2px;
-            }}
-            QTabBar::tab:selected {{
-                background: {border};
-                color: {fg};
-            }}
-            QPushButton {{
-                background: #313640;
-                color: #eee;
-                border-radius: 8px;
-            }}
-            QPushButton:hover {{
-                background: #374151;
-            }}
-        """)
-        help_html = load_markdown_html(doc_path("help_bg.md"), theme)
-        self.help_browser.setHtml(help_html)
-        about_html = load_markdown_html(doc_path("about_bg.md"), theme)
-        self.about_browser.setHtml(about_html)
-        if theme == "dark":
-            self.help_browser.setStyleSheet("background:#333333; color:#e0e0e0;")
-            self.about_browser.setStyleSheet("background:#333333; color:#e0e0e0;")
-        else:
-            self.help_browser.setStyleSheet("background:#fafafa; color:#2b2b2b;")
-            self.about_browser.setStyleSheet("background:#fafafa; color:#2b2b2b;")
-        self.theme = theme
+    def apply_theme(self, theme_name):
+        # Widget styles come from the application stylesheet; only the rendered HTML is per theme
+        if theme_name == self._applied_theme:
+            return
+        theme.apply(theme_name)
+        for attr, filename, _ in self._doc_tabs.values():
+            browser = getattr(self, attr)
+            if browser is not None:
+                self._theme_browser(browser, filename, theme_name)
+        self.theme = theme_name
+        self._applied_theme = theme_name
         self.update()
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        rect = QRectF(self.rect())
-        path = QPainterPath()
-        path.addRoundedRect(rect, 24, 24)
-        painter.fillPath(path, QBrush(QColor("#222222" if self.theme == "dark" else "#fafafa")))
+        self.background.paint(self, theme.color(self.theme, "dialog_paint"))
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
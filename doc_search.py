@@ -0,0 +1,162 @@
+# doc_search.py
+
+import os
+import re
+import json
+import bisect
+import html
+
+from docs import doc_path, load_bundle
+from settings import get_user_settings_path
+
+SEARCH_FILES = ("help_bg.md", "about_bg.md")
+INDEX_VERSION = 1
+MAX_PREFIX_WORDS = 64
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+# Common Bulgarian inflection endings (articles, plurals), longest first
+_SUFFIXES = (
+    "ищата", "овете", "ията", "ите", "ата", "ото", "ове", "еве", "ища",
+    "ият", "ия", "ът", "ят", "та", "то", "те", "а", "я", "о", "е", "и", "ъ",
+)
+MIN_STEM = 3
+
+def fold(text):
+    return text.casefold().replace("ѝ", "и")
+
+def stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text):
+    return [fold(w) for w in _WORD_RE.findall(text)]
+
+class DocIndex:
+    """
+    Inverted index over documentation lines: folded word -> block ids.
+    Words are kept sorted so both the word being typed and the stems of
+    finished words resolve with a binary search.
+    """
+    def __init__(self, blocks, words):
+        self.blocks = blocks  # [(filename, text)]
+        self.words = words  # {folded word: [block ids]}
+        self.sorted_words = sorted(words)
+        self.positions = {}  # filename -> {folded word: [(position, length)]} in the rendered document
+
+    def index_positions(self, filename, blocks):
+        """
+        Record where each word sits in a rendered document, given its
+        (block position, block text) pairs, so highlighting never scans
+        the document. Call again whenever the document is re-rendered.
+        """
+        positions = {}
+        for block_position, text in blocks:
+            for match in _WORD_RE.finditer(text):
+                positions.setdefault(fold(match.group()), []).append(
+                    (block_position + match.start(), match.end() - match.start()))
+        self.positions[filename] = positions
+
+    def locate(self, filename, words, limit):
+        """Up to limit (position, length) spans of words in filename, in document order."""
+        positions = self.positions.get(filename, {})
+        spans = []
+        for word in words:
+            spans.extend(positions.get(word, ()))
+        spans.sort()
+        return spans[:limit]
+
+    @classmethod
+    def build(cls, sources):
+        blocks = []
+        words = {}
+        for filename, text in sources:
+            for line in text.splitlines():
+                tokens = tokenize(line)
+                if not tokens:
+                    continue
+                block_id = len(blocks)
+                blocks.append((filename, line.strip()))
+                for token in set(tokens):
+                    words.setdefault(token, []).append(block_id)
+        return cls(blocks, words)
+
+    def _prefix_words(self, prefix):
+        start = bisect.bisect_left(self.sorted_words, prefix)
+        found = []
+        for word in self.sorted_words[start:start + MAX_PREFIX_WORDS]:
+            if not word.startswith(prefix):
+                break
+            found.append(word)
+        return found
+
+    def search(self, query):
+        """
+        Return (matched words, {filename: block count}). The last token
+        is treated as a prefix; earlier tokens match any word sharing their stem.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], {}
+        matched_words = []
+        block_ids = None
+        for i, token in enumerate(tokens):
+            candidates = self._prefix_words(token if i == len(tokens) - 1 else stem(token))
+            ids = set()
+            for word in candidates:
+                ids.update(self.words[word])
+            block_ids = ids if block_ids is None else block_ids & ids
+            matched_words.extend(candidates)
+            if not block_ids:
+                return [], {}
+        counts = {}
+        for block_id in block_ids:
+            filename = self.blocks[block_id][0]
+            counts[filename] = counts.get(filename, 0) + 1
+        return matched_words, counts
+
+def index_cache_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "doc_index.json")
+
+def _source_key(filenames):
+    key = {}
+    for filename in filenames:
+        try:
+            key[filename] = os.path.getmtime(doc_path(filename))
+        except OSError:
+            key[filename] = None
+    return key
+
+def load_index(filenames=SEARCH_FILES, cache_path=None):
+    """Load the index from the on-disk cache, rebuilding it if any source mtime changed."""
+    cache_path = cache_path or index_cache_path()
+    key = _source_key(filenames)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == INDEX_VERSION and cached.get("key") == key:
+            return DocIndex([tuple(b) for b in cached["blocks"]], cached["words"])
+    except Exception:
+        pass
+    sources = []
+    for filename in filenames:
+        try:
+            with open(doc_path(filename), encoding="utf-8") as f:
+                sources.append((filename, f.read()))
+        except OSError:
+            # Packaged builds may only ship the prebuilt HTML bundle
+            entry = load_bundle().get(filename)
+            if entry:
+                text = _TAG_RE.sub("\n", entry["html"])
+                sources.append((filename, html.unescape(text)))
+    index = DocIndex.build(sources)
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "key": key, "blocks": index.blocks, "words": index.words},
+                      f, ensure_ascii=False, separators=(",", ":"))
+    except Exception:
+        pass
+    return index
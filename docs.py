@@ -0,0 +1,89 @@
+# docs.py
+
+import sys
+import os
+import gzip
+import json
+import hashlib
+
+MARKDOWN_EXTENSIONS = ["extra", "tables", "sane_lists"]
+DOCS_BUNDLE = "docs_bundle.json.gz"
+MISSING_DOC_HTML = "<i>Документът не е наличен.</i>"
+
+DOC_CSS = {
+    "dark": """
+        <style>
+        body { background: #333333; color: #e0e0e0; font-family: Arial, sans-serif; }
+        h1, h2, h3, h4, h5 { color: #fafafa; }
+        code, pre { background: #181a20; color: #fff; border-radius: 4px; padding: 1px 4px; }
+        a { color: #8ab4f8; }
+        ul, ol { margin-left: 20px; }
+        </style>
+        """,
+    "light": """
+        <style>
+        body { background: #fafafa; color: #2b2b2b; font-family: Arial, sans-serif; }
+        h1, h2, h3, h4, h5 { color: #222; }
+        code, pre { background: #f1f1f1; color: #222; border-radius: 4px; padding: 1px 4px; }
+        a { color: #1a0dab; }
+        ul, ol { margin-left: 20px; }
+        </style>
+        """,
+}
+
+# (filepath, theme) -> (mtime, full html)
+_html_cache = {}
+_bundle = None
+
+def doc_path(filename):
+    base = os.path.dirname(os.path.abspath(sys.argv[0]))
+    return os.path.join(base, "Documentation", filename)
+
+def render_markdown(md_text):
+    import markdown  # Only needed when the prebuilt bundle is missing or stale
+    return markdown.markdown(md_text, extensions=MARKDOWN_EXTENSIONS)
+
+def load_bundle():
+    """Prebuilt {filename: {"sha256", "html"}} written by build_docs.py, or {}."""
+    global _bundle
+    if _bundle is None:
+        try:
+            with gzip.open(doc_path(DOCS_BUNDLE), "rt", encoding="utf-8") as f:
+                _bundle = json.load(f)
+        except Exception:
+            _bundle = {}
+    return _bundle
+
+def _body_html(filepath):
+    entry = load_bundle().get(os.path.basename(filepath))
+    try:
+        with open(filepath, encoding="utf-8") as f:
+            md_text = f.read()
+    except OSError:
+        return entry["html"] if entry else MISSING_DOC_HTML
+    if entry and entry.get("sha256") == hashlib.sha256(md_text.encode("utf-8")).hexdigest():
+        return entry["html"]
+    try:
+        return render_markdown(md_text)
+    except ImportError:
+        return entry["html"] if entry else MISSING_DOC_HTML
+    except Exception:
+        return MISSING_DOC_HTML
+
+def load_markdown_html(filepath, theme="light"):
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        mtime = None
+    cached = _html_cache.get((filepath, theme))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    css = DOC_CSS["dark"] if theme == "dark" else DOC_CSS["light"]
+    html = css + _body_html(filepath)
+    _html_cache[(filepath, theme)] = (mtime, html)
+    return html
+
+def clear_cache():
+    global _bundle
+    _html_cache.clear()
+    _bundle = None
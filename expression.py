@@ -0,0 +1,117 @@
+# expression.py
+#
+# Arithmetic in the converter input, e.g. "3×2.49+12.90". Amounts are exact
+# fractions and the result is rounded to cents once, at the end. Parsing is
+# incremental: finished terms are folded into a running sum when + or - is
+# typed, and finished factors into the current term when × or ÷ is, so a
+# keystroke only re-evaluates the number being typed and its term.
+# Backspace over an operator restores the state saved when it was typed.
+
+from fractions import Fraction
+
+from calculator import round_cents
+
+OPERATORS = "+-×÷"
+MAX_NUMBER_LENGTH = 10
+MAX_LENGTH = 60
+
+def _number_value(text):
+    text = text.rstrip(".")
+    return Fraction(text) if text else Fraction(0)
+
+class Expression:
+    """The input buffer plus its evaluation state; text is what was typed."""
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text=""):
+        self.text = ""
+        self._total = Fraction(0)  # sum of the finished terms; None after a division by zero
+        self._sign = 1  # sign of the current term
+        self._factor = None  # product of the finished factors of the current term
+        self._op = None  # "×" or "÷" between _factor and the number being typed
+        self._number = ""
+        self._saved = []  # state before each operator, for backspace
+        for char in text:
+            self.push(char)
+
+    @property
+    def number(self):
+        """The number being typed."""
+        return self._number
+
+    @property
+    def has_operators(self):
+        return bool(self._saved)
+
+    def push(self, char):
+        """Append a digit, "." or an operator; returns False when the character is ignored."""
+        if len(self.text) >= MAX_LENGTH:
+            return False
+        if char.isdigit():
+            if len(self._number) >= MAX_NUMBER_LENGTH:
+                return False
+            self._number += char
+        elif char == ".":
+            if "." in self._number:
+                return False
+            self._number += char
+        elif char in OPERATORS:
+            if not self._number:
+                # A second operator in a row replaces the first; none may lead
+                if not self.text or self.text[-1] not in OPERATORS:
+                    return False
+                self.pop()
+            self._saved.append((self._total, self._sign, self._factor, self._op, self._number))
+            term = self._term()
+            if char in "+-":
+                self._total = None if term is None or self._total is None else self._total + self._sign * term
+                self._sign = 1 if char == "+" else -1
+                self._factor = None
+                self._op = None
+            else:
+                self._factor = term
+                self._op = char
+            self._number = ""
+        else:
+            return False
+        self.text += char
+        return True
+
+    def pop(self):
+        """Remove the last character typed."""
+        if not self.text:
+            return
+        last = self.text[-1]
+        self.text = self.text[:-1]
+        if last in OPERATORS:
+            self._total, self._sign, self._factor, self._op, self._number = self._saved.pop()
+        else:
+            self._number = self._number[:-1]
+
+    def _term(self):
+        """Value of the current term, or None after a division by zero."""
+        if self._op is None:
+            return _number_value(self._number)
+        if self._factor is None:
+            return None
+        if not self._number:
+            return self._factor  # a trailing operator does not count yet
+        number = _number_value(self._number)
+        if self._op == "×":
+            return self._factor * number
+        return self._factor / number if number else None
+
+    def value(self):
+        """Exact value so far, or None after a division by zero."""
+        term = self._term()
+        if term is None or self._total is None:
+            return None
+        return self._total + self._sign * term
+
+    def cents(self):
+        value = self.value()
+        return None if value is None else round_cents(value)
+
+    def display(self):
+        return "".join(f" {c} " if c in OPERATORS else c for c in self.text)
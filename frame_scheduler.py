@@ -0,0 +1,56 @@
+# frame_scheduler.py
+#
+# Coalesces label refreshes under bursty input. Fast typists and barcode
+# scanners deliver keys faster than the screen refreshes. Each key only
+# changes the widget's input state and calls request(). The refresh
+# itself (conversion, formatting, clipboard and setText) runs at most
+# once per display frame.
+# - The first key after a pause is shown at once, from a zero timer that
+#   fires when the keys already queued have been handled.
+# - Keys arriving within the same frame share the next refresh.
+
+import time
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+DEFAULT_REFRESH_HZ = 60.0
+MIN_FRAME = 1 / 240
+MAX_FRAME = 1 / 30
+
+def frame_interval():
+    """Seconds per frame of the primary screen, within 1/240..1/30 s."""
+    app = QApplication.instance()
+    screen = app.primaryScreen() if app is not None else None
+    hz = screen.refreshRate() if screen is not None else 0
+    return min(MAX_FRAME, max(MIN_FRAME, 1 / hz if hz > 0 else 1 / DEFAULT_REFRESH_HZ))
+
+class FrameScheduler:
+    def __init__(self, callback, parent=None):
+        self.callback = callback
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        self.frame = frame_interval()
+        self.last_flush = 0.0
+        self.requests = 0
+        self.flushes = 0
+
+    @property
+    def pending(self):
+        return self.timer.isActive()
+
+    def request(self):
+        """Mark the labels dirty; they are refreshed in the current or next frame."""
+        self.requests += 1
+        if self.timer.isActive():
+            return
+        wait = self.last_flush + self.frame - time.perf_counter()
+        self.timer.start(max(0, int(wait * 1000 + 0.999)))
+
+    def flush(self):
+        """Refresh now; a pending request is dropped."""
+        self.timer.stop()
+        self.last_flush = time.perf_counter()
+        self.flushes += 1
+        self.callback()
@@ -0,0 +1,93 @@
+# http_client.py
+
+import os
+import json
+import time
+import threading
+
+from version import VERSION
+from settings import get_user_settings_path
+
+MANIFEST_URL = "https://raw.githubusercontent.com/zdravkopavlov/Currency-Coverter/main/latest_version.json"
+POOL_SIZE = 4  # enough for the parallel update segments
+
+_session = None
+_session_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+def get_session():
+    """Process-wide requests session with pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported here so an idle app can unload requests (see idle_trim.py)
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = f"BGN-EUR-Converter/{VERSION}"
+            _session = session
+    return _session
+
+def close_session():
+    """Close the pooled connections; the next get_session() opens a new session."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def manifest_cache_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "manifest_cache.json")
+
+def _load_cache(url):
+    try:
+        with open(manifest_cache_path(), encoding="utf-8") as f:
+            cached = json.load(f)
+        return cached if cached.get("url") == url else None
+    except Exception:
+        return None
+
+def _save_cache(entry):
+    path = manifest_cache_path()
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except Exception:
+        pass
+
+def fetch_manifest(url=MANIFEST_URL, timeout=4, max_age=0):
+    """
+    Return latest_version.json as a dict. The last copy is cached on disk
+    and revalidated with ETag/If-Modified-Since, so an unchanged manifest
+    costs a 304. A copy younger than max_age seconds is returned without
+    any request.
+    """
+    with _cache_lock:
+        cached = _load_cache(url)
+    if cached and max_age and time.time() - cached.get("fetched_at", 0) < max_age:
+        return cached["data"]
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    r = get_session().get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and cached:
+        cached["fetched_at"] = time.time()
+    else:
+        r.raise_for_status()
+        cached = {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "data": r.json(),
+        }
+    with _cache_lock:
+        _save_cache(cached)
+    return cached["data"]
@@ -0,0 +1,131 @@
+# idle_trim.py
+#
+# The app lives in the tray all day. Once every register window has been
+# hidden for a while, drop what can be rebuilt on demand: the info dialog,
+# rendered document HTML, small lookup caches, the markdown module and the
+# shared HTTP session with its pooled connections, then hand the freed
+# pages back to the OS. The session is left alone while something may be
+# using it: a task on the pool (update check or download) or the sync
+# agent. Network packages stay imported: dropping requests from
+# sys.modules would give a re-import new exception classes that the old
+# except clauses no longer catch.
+
+import gc
+import sys
+import time
+
+from PyQt5.QtCore import QObject, QTimer, QEvent, QCoreApplication
+
+import diagnostics
+
+IDLE_TRIM_MINUTES = 10
+UNLOAD_MODULES = ("markdown",)  # only our own pure-Python renderer, never third-party network packages
+
+last_trim = None  # {"time", "rss_before", "rss_after", "modules"} of the latest trim
+
+def unload_modules(prefixes=UNLOAD_MODULES):
+    """Forget lazily imported packages; the next import loads them again."""
+    names = [name for name in sys.modules if name.split(".", 1)[0] in prefixes]
+    for name in names:
+        del sys.modules[name]
+    return len(names)
+
+def release_os_memory():
+    """Return freed heap pages to the OS so the resident size actually drops."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            ctypes.windll.psapi.EmptyWorkingSet.argtypes = [wintypes.HANDLE]
+            ctypes.windll.psapi.EmptyWorkingSet(kernel32.GetCurrentProcess())
+        elif sys.platform.startswith("linux"):
+            import ctypes
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except Exception as e:
+        print("Could not release memory to the OS:", e)
+
+def tasks_busy():
+    tasks = sys.modules.get("tasks")
+    return tasks is not None and tasks.busy()
+
+def sync_running():
+    sync_agent = sys.modules.get("sync_agent")
+    return sync_agent is not None and sync_agent.current() is not None
+
+def trim_caches(close_session=True):
+    """Clear module-level caches that rebuild themselves on next use."""
+    import docs
+    import http_client
+    from calculator import quick_tenders
+    docs.clear_cache()
+    if close_session:
+        http_client.close_session()
+    quick_tenders.cache_clear()
+    catalog = sys.modules.get("catalog")
+    if catalog is not None and catalog._catalog is not None:
+        catalog._catalog.lookup.cache_clear()
+
+def trim_process(release_callbacks=()):
+    global last_trim
+    rss_before = diagnostics.memory_usage()[0]
+    for callback in release_callbacks:
+        callback()
+    # Run the pending deleteLater() calls now, before collecting
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    busy = tasks_busy()
+    network_idle = not busy and not sync_running()
+    trim_caches(close_session=network_idle)
+    # Running tasks may render docs; leave markdown loaded for them
+    modules = 0 if busy else unload_modules()
+    gc.collect()
+    release_os_memory()
+    last_trim = {
+        "time": time.time(),
+        "rss_before": rss_before,
+        "rss_after": diagnostics.memory_usage()[0],
+        "modules": modules,
+    }
+    return last_trim
+
+class IdleTrimmer(QObject):
+    """Runs trim_process once all watched windows have stayed hidden for delay seconds."""
+    def __init__(self, release_callbacks=(), delay=IDLE_TRIM_MINUTES * 60):
+        super().__init__()
+        self.release_callbacks = list(release_callbacks)
+        self.windows = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(lambda: trim_process(self.release_callbacks))
+        self.set_delay(delay)
+
+    def set_delay(self, delay):
+        """Seconds hidden before trimming; 0 turns trimming off."""
+        self.delay = delay
+        self.timer.setInterval(int(delay * 1000))
+        self.check()
+
+    def watch(self, window):
+        self.windows.append(window)
+        window.installEventFilter(self)
+        self.check()
+
+    def unwatch(self, window):
+        if window in self.windows:
+            self.windows.remove(window)
+            window.removeEventFilter(self)
+        self.check()
+
+    def check(self):
+        if self.delay and self.windows and not any(w.isVisible() for w in self.windows):
+            if not self.timer.isActive():
+                self.timer.start()
+        else:
+            self.timer.stop()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Show, QEvent.Hide):
+            # Hide arrives while isVisible() is still true for the hiding window
+            QTimer.singleShot(0, self.check)
+        return False
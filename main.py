@@ -2,23 +2,32 @@ from version import VERSION
 
 import sys
 import os
-import requests
 import json
 from PyQt5.QtWidgets import (
-    QApplication, QSystemTrayIcon, QMenu, QAction
+    QApplication, QSystemTrayIcon, QMenu, QWidget
 )
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import Qt, QObject
 
-from settings import load_settings, save_settings, get_theme
-from calculator import eur_to_bgn  # For correct BGN computation
+from settings import load_settings, get_theme, RegisterSettings, SettingsWriter
+from calculator import units_to_bgn_cents, units_to_eur_cents
 from converter_widget import ConverterWidget
 from change_widget import ChangeWidget
-from dialogs import InfoDialog
+from basket_widget import BasketWidget
+from dialogs import InfoDialog, SettingsTab
 from app_window import AppWindow
+from http_client import MANIFEST_URL, fetch_manifest
+import diagnostics
+import profiling
+import theme
+import till_log
+import sync_agent
+import tasks
+import session
+from idle_trim import IdleTrimmer, IDLE_TRIM_MINUTES
 
 window_title = "BGN/EUR Converter SingleInstance MainWindow"
-UPDATE_URL = "https://raw.githubusercontent.com/zdravkopavlov/Currency-Coverter/main/latest_version.json"
+UPDATE_URL = MANIFEST_URL
 
 def resource_path(filename):
     if hasattr(sys, '_MEIPASS'):
@@ -27,8 +36,7 @@ def resource_path(filename):
 
 def check_for_update(current_version, url=UPDATE_URL):
     try:
-        r = requests.get(url, timeout=4)
-        data = r.json()
+        data = fetch_manifest(url, timeout=4)
         latest = data.get("version")
         if latest and latest != current_version:
             return data
@@ -37,75 +45,251 @@ def check_for_update(current_version, url=UPDATE_URL):
         print("Update check failed:", e)
         return None
 
-def apply_theme_main(app_win, converter, changer, theme_name):
-    if theme_name == "dark":
-        fg = "#e0e0e0"
-        bg = "#222222"
-    else:
-        fg = "#2b2b2b"
-        bg = "#fafafa"
-    app_win.set_bg_color(bg)
-    converter.input_label.setStyleSheet(f"color:{fg}; background:transparent;")
-    converter.output_label.setStyleSheet(f"color:{fg}; background:transparent;")
-    converter.set_version_label_color(fg)
-    changer.rest_label.setStyleSheet(f"color:{fg};")
-    changer.change_label.setStyleSheet(f"color:{fg}; background:transparent;")
-    changer.set_version_label_color(fg)
-    app_win.update()
+def apply_theme_main(app_win, theme_name):
+    # Labels and buttons follow the application stylesheet; only the painted background is per window
+    theme.apply(theme_name)
+    app_win.set_bg_color(theme.color(theme_name, "window_bg"))
+
+def start_profiling():
+    """Time the hot paths and start the stack sampler (see profiling.py)."""
+    import docs
+    import dialogs
+    this = sys.modules[__name__]
+    targets = []
+    for cls in (ConverterWidget, ChangeWidget, BasketWidget):
+        targets.append((cls, "update_labels", f"{cls.__name__}.update_labels"))
+        targets.append((cls, "_build_layout", f"{cls.__name__}._build_layout"))
+    targets += [
+        (this, "apply_theme_main"),
+        (docs, "load_markdown_html"),
+        (dialogs, "load_markdown_html"),
+        (SettingsWriter, "write", "SettingsWriter.write"),
+        (SettingsTab, "save_settings", "SettingsTab.save_settings"),
+    ]
+    return profiling.start(targets)
+
+# Page indexes in AppWindow.stacked
+PAGE_CONVERTER = 0
+PAGE_CHANGE = 1
+PAGE_BASKET = 2
 
 class MainEventFilter(QObject):
-    def __init__(self, app_win, converter, changer, set_minimal_mode, show_info, toggle_always_on_top, set_update_available, settings, apply_theme):
+    def __init__(self, app_win, converter, changer, basket, set_minimal_mode, show_info, toggle_always_on_top, set_update_available, settings, apply_theme, on_key=None):
         super().__init__()
         self.app_win = app_win
         self.converter = converter
         self.changer = changer
+        self.basket = basket
+        self._return_index = PAGE_CONVERTER
         self.set_minimal_mode = set_minimal_mode
         self.show_info = show_info
         self.toggle_always_on_top = toggle_always_on_top
         self.set_update_available = set_update_available
         self.settings = settings
         self.apply_theme = apply_theme
+        self.on_key = on_key  # any key for this window, before it is handled
 
     def eventFilter(self, obj, event):
         if event.type() == event.KeyPress:
-            idx = self.app_win.currentIndex()
-            if event.key() == Qt.Key_Tab:
-                if idx == 0:
-                    # Go to change page
-                    try:
-                        if self.converter.bgn_to_eur_mode:
-                            price = float(self.converter.input_value) if self.converter.input_value else 0.0
-                        else:
-                            price = eur_to_bgn(float(self.converter.input_value)) if self.converter.input_value else 0.0
-                    except ValueError:
-                        price = 0.0
-                    self.changer.set_price_bgn(price)
-                    self.changer.paid_bgn = ""
-                    self.changer.update_labels()
-                    self.app_win.setCurrentIndex(1)
-                    self.changer.setFocus()
-                else:
-                    # Go to converter page
-                    self.app_win.setCurrentIndex(0)
-                    self.converter.setFocus()
-                return True
-            elif event.key() == Qt.Key_C and not event.modifiers():
-                self.set_minimal_mode(not self.converter.minimal_mode, save=True)
-                return True
-            elif event.key() == Qt.Key_A and not event.modifiers():
-                self.toggle_always_on_top()
-                self.settings["always_on_top"] = self.app_win._always_on_top
-                save_settings(self.settings)
-                return True
-            elif event.key() == Qt.Key_F1:
-                self.show_info()
-                return True
+            # Shortcuts belong to the converter window only, not to text fields in dialogs
+            if not isinstance(obj, QWidget) or obj.window() is not self.app_win:
+                return False
+            diagnostics.key_pressed()
+            if self.on_key:
+                self.on_key()
+            with diagnostics.stage("event_filter"):
+                return self.handle_key(event)
         return False
 
+    def handle_key(self, event):
+        """Window-wide shortcuts; returns True when the key was consumed here."""
+        idx = self.app_win.currentIndex()
+        if event.key() == Qt.Key_Tab:
+            if idx == PAGE_CONVERTER:
+                # Go to change page with the evaluated input (an amount or an expression)
+                bgn_cents, eur_cents = self.converter.amounts_cents()
+                if bgn_cents:
+                    direction = "BGN>EUR" if self.converter.bgn_to_eur_mode else "EUR>BGN"
+                    till_log.record("conversion", reg=self.settings.number, source="converter",
+                                    dir=direction, bgn=bgn_cents, eur=eur_cents)
+                self.go_to_change(self.converter.amount_units(), PAGE_CONVERTER)
+            elif idx == PAGE_BASKET:
+                # Hand the basket total to the change page
+                total_units = self.basket.total_units
+                if total_units:
+                    till_log.record("conversion", reg=self.settings.number, source="basket", dir="BGN>EUR",
+                                    bgn=units_to_bgn_cents(total_units), eur=units_to_eur_cents(total_units))
+                self.go_to_change(total_units, PAGE_BASKET)
+            else:
+                # Leaving the change page commits the change that was given
+                transaction = self.changer.transaction()
+                if transaction:
+                    till_log.record("change", reg=self.settings.number, **transaction)
+                # Go back to the page the price came from
+                self.go_to_page(self._return_index)
+            return True
+        elif event.key() == Qt.Key_B and not event.modifiers():
+            self.go_to_page(PAGE_CONVERTER if idx == PAGE_BASKET else PAGE_BASKET)
+            return True
+        elif event.key() == Qt.Key_C and not event.modifiers():
+            self.set_minimal_mode(not self.converter.minimal_mode, save=True)
+            return True
+        elif event.key() == Qt.Key_A and not event.modifiers():
+            # The "always_on_top" subscriber applies the window flag
+            self.settings["always_on_top"] = not self.app_win._always_on_top
+            return True
+        elif event.key() == Qt.Key_F1:
+            self.show_info()
+            return True
+        return False
+
+    def go_to_change(self, price_units, return_index):
+        self.changer.set_price_units(price_units)
+        self._return_index = return_index
+        self.go_to_page(PAGE_CHANGE)
+
+    def go_to_page(self, idx):
+        self.app_win.setCurrentIndex(idx)
+        self.app_win.widget(idx).setFocus()
+
+class Register:
+    """
+    One cashier station: an AppWindow with its own converter, change and
+    basket pages, direction and placement. Settings, theme, tray icon and
+    the info dialog are shared by every register in the process.
+    """
+    def __init__(self, number, settings, icon, show_info, on_change=None):
+        self.number = number
+        self.settings = RegisterSettings(settings, number)
+        title = window_title if number == 1 else f"{window_title} {number}"
+        self.app_win = AppWindow(icon, title, always_on_top=self.settings.get("always_on_top", True))
+        self.converter = ConverterWidget(self.app_win, self.settings)
+        self.changer = ChangeWidget(self.app_win, self.settings)
+        self.basket = BasketWidget(self.app_win, self.settings)
+
+        # Set direction from settings as soon as widget is created (do not touch again)
+        self.converter.bgn_to_eur_mode = self.settings.get("last_direction_bgn_to_eur", True)
+        self.converter.update_labels()
+
+        for page in (self.converter, self.changer, self.basket):
+            self.app_win.addWidget(page)
+            page.set_open_updates_callback(lambda: show_info(self, "updates"))
+
+        self._subscriptions = [
+            self.settings.subscribe(["theme"], lambda changes: self.apply_theme(get_theme(self.settings))),
+            self.settings.subscribe(["always_on_top"], lambda changes: self.app_win.set_always_on_top(changes[-1].new)),
+            self.settings.subscribe(["auto_copy_result"], self.on_auto_copy_changed),
+        ]
+
+        self.event_filter = MainEventFilter(
+            self.app_win, self.converter, self.changer, self.basket,
+            self.set_minimal_mode, lambda: show_info(self),
+            self.app_win.toggle_always_on_top, self.set_update_available,
+            self.settings, self.apply_theme, on_key=on_change
+        )
+        QApplication.instance().installEventFilter(self.event_filter)
+        if on_change:
+            self.converter.switch_button.clicked.connect(lambda: on_change())
+
+    def set_minimal_mode(self, minimal, save=False):
+        self.converter.set_mode(minimal)
+        self.changer.set_mode(minimal)
+        self.basket.set_mode(minimal)
+        if minimal:
+            self.app_win.setFixedSize(325, 50)
+        else:
+            self.app_win.setFixedSize(250, 220)
+        if save:
+            self.settings["minimal_mode"] = minimal
+
+    def apply_theme(self, theme_name):
+        apply_theme_main(self.app_win, theme_name)
+
+    def set_update_available(self, info):
+        is_update = bool(info)
+        self.converter.set_update_available(is_update)
+        self.changer.set_update_available(is_update)
+        self.basket.set_update_available(is_update)
+
+    def on_auto_copy_changed(self, changes):
+        # Copy again on the next change once auto copy is re-enabled
+        self.changer._last_copied = None
+        self.basket._last_copied = None
+
+    def restore(self, near=None):
+        """Restore position and mode; a register without a saved position opens next to near."""
+        x, y = self.settings.get("x"), self.settings.get("y")
+        if x is not None and y is not None:
+            self.app_win.move(x, y)
+        elif near is not None:
+            self.app_win.move(near.pos().x() + 40, near.pos().y() + 40)
+        self.set_minimal_mode(self.settings.get("minimal_mode", False))
+        self.apply_theme(get_theme(self.settings))
+
+    def session_state(self):
+        """What the cashier was doing, for the warm-restart snapshot (session.py)."""
+        return session.RegisterState(
+            page=self.app_win.currentIndex(),
+            return_page=self.event_filter._return_index,
+            bgn_to_eur=self.converter.bgn_to_eur_mode,
+            tender_eur=self.changer.tender_eur,
+            basket_bgn=self.basket.bgn_mode,
+            price_units=self.changer.price_units,
+            input=self.converter.input_value,
+            paid_bgn=self.changer.paid_bgn,
+            paid_eur=self.changer.paid_eur,
+            basket_entry=self.basket.entry,
+            basket_items=[(cents, bgn) for _, bgn, cents in self.basket.items],
+        )
+
+    def restore_session(self, state):
+        self.converter.bgn_to_eur_mode = state.bgn_to_eur
+        self.converter.input_value = state.input
+        self.converter.update_labels()
+        self.changer.set_price_units(state.price_units)
+        self.changer.paid_bgn = state.paid_bgn
+        self.changer.paid_eur = state.paid_eur
+        self.changer.tender_eur = state.tender_eur
+        self.changer.update_labels()
+        self.basket.restore(state.basket_items, state.basket_entry, state.basket_bgn)
+        if state.return_page in (PAGE_CONVERTER, PAGE_BASKET):
+            self.event_filter._return_index = state.return_page
+        if state.page in (PAGE_CONVERTER, PAGE_CHANGE, PAGE_BASKET):
+            self.event_filter.go_to_page(state.page)
+
+    def save_state(self):
+        pos = self.app_win.pos()
+        self.settings.update({"x": pos.x(), "y": pos.y(), "minimal_mode": self.converter.minimal_mode})
+
+    def show(self):
+        self.app_win.show()
+        self.app_win.raise_()
+        self.app_win.activateWindow()
+        self.app_win.setFocus()
+
+    def toggle_show_hide(self):
+        if self.app_win.isVisible():
+            self.app_win.hide()
+        else:
+            self.show()
+
+    def close(self):
+        self.save_state()
+        for subscription in self._subscriptions:
+            self.settings.unsubscribe(subscription)
+        QApplication.instance().removeEventFilter(self.event_filter)
+        self.app_win.hide()
+        self.app_win.deleteLater()
+
 def main():
     settings = load_settings()
     app = QApplication(sys.argv)
 
+    # Opt-in: wrap hot paths before any widget is built
+    if profiling.profiling_requested(settings):
+        start_profiling()
+        app.aboutToQuit.connect(profiling.stop)
+
     icon_path = resource_path("icon.ico")
     icon = QIcon(icon_path) if os.path.exists(icon_path) else QIcon()
     app.setWindowIcon(icon)
@@ -113,94 +297,143 @@ def main():
     tray = QSystemTrayIcon(icon, app)
     tray.setToolTip("BGN/EUR Конвертор")
     menu = QMenu()
-    restore_action = QAction("Покажи", tray)
-    quit_action = QAction("Изход", tray)
-    menu.addAction(restore_action)
-    menu.addAction(quit_action)
     tray.setContextMenu(menu)
 
-    # Main custom window
-    app_win = AppWindow(icon, window_title, always_on_top=settings.get("always_on_top", True))
-    converter = ConverterWidget(app_win, settings)
-    changer = ChangeWidget(app_win, settings)
-
-    # Set direction from settings as soon as widget is created (do not touch again)
-    converter.bgn_to_eur_mode = settings.get("last_direction_bgn_to_eur", True)
-    converter.update_labels()
-
-    app_win.addWidget(converter)
-    app_win.addWidget(changer)
-
+    registers = []
     info_dialog = [None]
     update_info = [None]
 
-    # Minimal mode
-    def set_minimal_mode(minimal, save=False):
-        converter.set_mode(minimal)
-        changer.set_mode(minimal)
-        if minimal:
-            app_win.setFixedSize(325, 50)
-        else:
-            app_win.setFixedSize(250, 220)
-        if save:
-            settings["minimal_mode"] = minimal
-            save_settings(settings)
-
-    # Apply theme to all
-    def apply_theme(theme_name):
-        apply_theme_main(app_win, converter, changer, theme_name)
-        app_win.update()
-
     # Settings/info dialog
-    def show_info(tab=None):
-        if info_dialog[0] is None or not info_dialog[0].isVisible():
+    def show_info(register, tab=None):
+        # One dialog per session, owned by no register (any of them can be removed);
+        # later opens only refresh and re-theme it
+        if info_dialog[0] is None:
             info_dialog[0] = InfoDialog(
-                parent=app_win,
                 app_settings=settings,
-                on_settings_changed=lambda s: [save_settings(s), apply_theme(get_theme(s))],
+                on_settings_changed=None,
                 update_info=update_info[0],
                 manual_update_callback=manual_update
             )
+        elif not info_dialog[0].isVisible():
+            info_dialog[0].refresh(update_info[0])
+            info_dialog[0].apply_theme(get_theme(settings))
+        if not info_dialog[0].isVisible():
+            # Open next to the register that asked for it
+            info_dialog[0].anchor = register.app_win
             info_dialog[0].show()
             info_dialog[0].activateWindow()
             info_dialog[0].setFocus()
         if tab == "updates":
             info_dialog[0].tabs.setCurrentIndex(0)
 
-    converter.set_open_updates_callback(lambda: show_info("updates"))
-    changer.set_open_updates_callback(lambda: show_info("updates"))
-
     # Update logic
     def set_update_available(info):
-        is_update = bool(info)
-        converter.set_update_available(is_update)
-        changer.set_update_available(is_update)
-
-    # Manual update logic
-    def manual_update():
-        info = check_for_update(VERSION)
-        update_info[0] = info
-        set_update_available(info)
-        return info
-
-    # Event filter
-    event_filter = MainEventFilter(
-        app_win, converter, changer,
-        set_minimal_mode, show_info,
-        app_win.toggle_always_on_top, set_update_available,
-        settings, apply_theme
+        for register in registers:
+            register.set_update_available(info)
+
+    # Update checks run on the task pool; on_done(info) is called on the GUI thread
+    def manual_update(on_done=None):
+        def checked(info):
+            update_info[0] = info
+            set_update_available(info)
+            if info_dialog[0] is not None:
+                info_dialog[0].refresh(info)
+            if on_done:
+                on_done(info)
+        return tasks.submit("update_check", check_for_update, VERSION, on_result=checked)
+
+    # Idle trim: free rebuildable state once every register has been hidden a while
+    def release_info_dialog():
+        if info_dialog[0] is not None and not info_dialog[0].isVisible():
+            info_dialog[0].release()
+            info_dialog[0] = None
+
+    def release_backgrounds():
+        for register in registers:
+            register.app_win.background.invalidate()
+
+    trimmer = IdleTrimmer(
+        [release_info_dialog, release_backgrounds],
+        delay=settings.get("idle_trim_minutes", IDLE_TRIM_MINUTES) * 60
+    )
+    settings.subscribe(["idle_trim_minutes"], lambda changes: trimmer.set_delay(changes[-1].new * 60))
+
+    def add_register():
+        register = Register(len(registers) + 1, settings, icon, show_info, on_change=session_saver.mark_dirty)
+        register.restore(near=registers[-1].app_win if registers else None)
+        register.set_update_available(update_info[0])
+        registers.append(register)
+        trimmer.watch(register.app_win)
+        session_saver.mark_dirty()
+        return register
+
+    def add_register_from_tray():
+        add_register().show()
+        settings["register_count"] = len(registers)
+
+    def remove_last_register():
+        register = registers.pop()
+        trimmer.unwatch(register.app_win)
+        if info_dialog[0] is not None and info_dialog[0].anchor is register.app_win:
+            info_dialog[0].release()
+            info_dialog[0] = None
+        register.close()
+        settings["register_count"] = len(registers)
+        session_saver.mark_dirty()
+
+    # Shared settings subscriptions; each register subscribes to its own keys
+    settings_writer = SettingsWriter()
+
+    def save_in_background(changes):
+        sequence, data = settings_writer.snapshot(settings)
+        tasks.submit("save_settings", settings_writer.write, sequence, data, priority=tasks.PRIORITY_LOW)
+
+    settings.subscribe(None, save_in_background)
+
+    def on_auto_check_changed(changes):
+        if changes[-1].new:
+            manual_update()
+
+    settings.subscribe(["auto_check_updates"], on_auto_check_changed)
+    settings.subscribe(["diagnostics_enabled"], lambda changes: diagnostics.set_enabled(changes[-1].new))
+    diagnostics.set_enabled(settings.get("diagnostics_enabled", False))
+
+    # Store-wide sync is optional: without a collector URL nothing is logged or sent
+    def apply_sync(changes=None):
+        if settings.get("sync_url"):
+            sync_agent.start(settings["sync_url"], settings.get("till_id"))
+        else:
+            sync_agent.stop()
+            till_log.stop()
+
+    settings.subscribe(["sync_url", "till_id"], apply_sync)
+    apply_sync()
+
+    # Warm restart: inputs, pages and prices come back from the session snapshot before the first paint
+    session_saver = session.SessionSaver(
+        lambda: session.Session(settings.get("theme", 2), [register.session_state() for register in registers])
     )
-    app.installEventFilter(event_filter)
+    settings.subscribe(["theme"], lambda changes: session_saver.mark_dirty())
+
+    for _ in range(max(1, int(settings.get("register_count", 1)))):
+        add_register()
+
+    snapshot = session.load()
+    if snapshot is not None:
+        # A crash can beat the background settings write; the snapshot has the theme in use
+        if snapshot.theme != settings.get("theme", 2) and snapshot.theme in (0, 1, 2):
+            settings["theme"] = snapshot.theme
+        for register, state in zip(registers, snapshot.registers):
+            register.restore_session(state)
 
-    # Tray logic
+    # Tray logic: clicking the icon shows or hides every register
     def toggle_show_hide():
-        if app_win.isVisible():
-            app_win.hide()
+        if any(register.app_win.isVisible() for register in registers):
+            for register in registers:
+                register.app_win.hide()
         else:
-            app_win.show()
-            app_win.raise_()
-            app_win.activateWindow()
-            app_win.setFocus()
+            for register in registers:
+                register.show()
 
     def tray_activated(reason):
         if reason in (QSystemTrayIcon.Trigger, QSystemTrayIcon.DoubleClick):
@@ -208,49 +441,48 @@ def main():
 
     tray.activated.connect(tray_activated)
 
-    def update_tray_label():
-        if app_win.isVisible():
-            restore_action.setText("Затвори")
-        else:
-            restore_action.setText("Покажи")
-
-    menu.aboutToShow.connect(update_tray_label)
-    restore_action.triggered.connect(toggle_show_hide)
-    quit_action.triggered.connect(app.quit)
+    def build_tray_menu():
+        menu.clear()
+        for register in registers:
+            text = "Затвори" if register.app_win.isVisible() else "Покажи"
+            if len(registers) > 1:
+                text += f" каса {register.number}"
+            menu.addAction(text).triggered.connect(register.toggle_show_hide)
+        menu.addSeparator()
+        menu.addAction("Добави каса").triggered.connect(add_register_from_tray)
+        if len(registers) > 1:
+            menu.addAction(f"Премахни каса {registers[-1].number}").triggered.connect(remove_last_register)
+        menu.addAction("Изход").triggered.connect(app.quit)
+
+    build_tray_menu()
+    menu.aboutToShow.connect(build_tray_menu)
     tray.show()
 
     # Save dialog position/state on close/hide
     def cleanup():
-        pos = app_win.pos()
-        settings["x"] = pos.x()
-        settings["y"] = pos.y()
-        settings["minimal_mode"] = converter.minimal_mode
-        save_settings(settings)
+        for register in registers:
+            register.save_state()
+        session_saver.save_now()
+        sync_agent.stop()
+        till_log.stop()
+        # Queued settings writes are dropped with the other tasks and replaced by one final write here;
+        # a download or update check still running after the grace period does not hold up the exit
+        executor = tasks.get_executor()
+        executor.cancel_all()
+        settings_writer.write(*settings_writer.snapshot(settings))
+        executor.shutdown(2000)
 
     app.aboutToQuit.connect(cleanup)
 
-    # Restore dialog position/state/theme/minimal
-    x, y = settings.get("x"), settings.get("y")
-    if x is not None and y is not None:
-        app_win.move(x, y)
-    minimal_mode = settings.get("minimal_mode", False)
-    set_minimal_mode(minimal_mode)
-
-    theme_name = get_theme(settings)
-    apply_theme(theme_name)
-
     # Show/hide logic at start
-    if settings.get("start_minimized", True):
-        app_win.hide()
-    else:
-        app_win.show()
-        app_win.setFocus()
+    if not settings.get("start_minimized", True):
+        for register in registers:
+            register.app_win.show()
+        registers[0].app_win.setFocus()
 
     # Initial auto update check
     if settings.get("auto_check_updates", True):
-        info = check_for_update(VERSION)
-        update_info[0] = info
-        set_update_available(info)
+        manual_update()
 
     sys.exit(app.exec_())
 
@@ -6,12 +6,13 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('icon.ico', '.')],
+    # Documentation/docs_bundle.json.gz is produced by build_docs.py
+    datas=[('icon.ico', '.'), ('Documentation/docs_bundle.json.gz', 'Documentation')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['markdown'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -0,0 +1,162 @@
+# profiling.py
+#
+# Opt-in profiling for tills in production: call timers around a few hot
+# paths plus a background stack sampler. Samples of the GUI thread are
+# written as folded stacks ("frame;frame;frame count" per line, the input
+# of flamegraph.pl and speedscope) to rotating files in the settings
+# folder. Enabled by the "profiling_enabled" setting or BGN_EUR_PROFILE=1.
+
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import functools
+import threading
+
+from settings import get_user_settings_path
+
+PROFILE_ENV = "BGN_EUR_PROFILE"
+SAMPLE_INTERVAL = 0.02  # 50 samples per second
+FLUSH_INTERVAL = 30.0
+MAX_FILE_BYTES = 512 * 1024
+BACKUP_COUNT = 3
+MAX_DEPTH = 48
+
+class CallTimer:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+_timers = {}
+_sampler = None
+
+def profiling_requested(settings):
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0") or bool(settings.get("profiling_enabled", False))
+
+def profile_dir():
+    path = os.path.join(os.path.dirname(get_user_settings_path()), "profiles")
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+def wrap(owner, attr, name=None):
+    """Replace owner.attr with a timed wrapper; name defaults to the attribute name."""
+    func = getattr(owner, attr)
+    if getattr(func, "_profiled", False):
+        return
+    timer = _timers.setdefault(name or attr, CallTimer())
+    # PyQt drops signal arguments a slot does not accept; keep that working
+    params = inspect.signature(func).parameters.values()
+    max_args = None
+    if not any(p.kind == p.VAR_POSITIONAL for p in params):
+        max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args[:max_args], **kwargs)
+        finally:
+            timer.add(time.perf_counter() - start)
+
+    wrapper._profiled = True
+    setattr(owner, attr, wrapper)
+
+def timer_summaries():
+    return {
+        name: {
+            "count": t.count,
+            "total_ms": t.total * 1000,
+            "mean_ms": t.total / t.count * 1000 if t.count else 0.0,
+            "max_ms": t.max * 1000,
+        }
+        for name, t in _timers.items()
+    }
+
+def _fold(frame):
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)  # qualified names from Python 3.11
+        names.append(f"{os.path.basename(code.co_filename)}:{name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack and appends folded counts to a rotating file."""
+    def __init__(self, thread_id, folder, interval=SAMPLE_INTERVAL, flush_interval=FLUSH_INTERVAL):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.thread_id = thread_id
+        self.path = os.path.join(folder, "profile.folded")
+        self.timers_path = os.path.join(folder, "profile_timers.json")
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.counts = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        last_flush = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = _fold(frame)
+                with self._lock:
+                    self.counts[stack] = self.counts.get(stack, 0) + 1
+            del frame
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def stop(self):
+        self._stop_event.set()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        try:
+            if counts:
+                self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(f"{stack} {n}\n" for stack, n in counts.items())
+            with open(self.timers_path, "w", encoding="utf-8") as f:
+                json.dump(timer_summaries(), f, indent=1)
+        except OSError as e:
+            print("Could not write profile:", e)
+
+    def _rotate(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < MAX_FILE_BYTES:
+            return
+        for i in range(BACKUP_COUNT - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, self.path + ".1")
+
+def start(targets, folder=None):
+    """Wrap (owner, attr[, name]) targets with timers and start sampling the calling thread."""
+    global _sampler
+    for target in targets:
+        wrap(*target)
+    if _sampler is None:
+        _sampler = StackSampler(threading.get_ident(), folder or profile_dir())
+        _sampler.start()
+        atexit.register(stop)
+    return _sampler
+
+def stop():
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
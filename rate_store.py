@@ -0,0 +1,218 @@
+# rate_store.py
+#
+# Offline historical exchange rates for checking old invoices. A rate file
+# in the ECB format (eurofxref-hist.xml or .csv, rates per 1 EUR) is parsed
+# once into a compact sorted binary file that is memory-mapped for lookups:
+#   b"BGNRATE1" <u32 date count> <u32 currency count>
+#   currency codes, 3 ASCII bytes each, padded to 8
+#   dates as u32 days since 1970-01-01, ascending, padded to 8
+#   rates as f64 [date][currency], NaN where the ECB published none
+# Staff import the file and look rates up from Настройки (dialogs.SettingsTab);
+# the same can be done from the command line:
+# Import once:  python rate_store.py import eurofxref-hist.xml
+# Look up:      python rate_store.py rate USD 2020-03-16
+
+import os
+import sys
+import csv
+import mmap
+import math
+import struct
+import bisect
+import datetime
+import xml.etree.ElementTree as ET
+
+from settings import get_user_settings_path
+
+MAGIC = b"BGNRATE1"
+HEADER = struct.Struct("<II")
+EPOCH = datetime.date(1970, 1, 1)
+BASE_CURRENCY = "EUR"
+BUNDLED_RATES = ("eurofxref-hist.xml", "eurofxref-hist.csv")
+MAX_GAP_DAYS = 366  # how far back a missing rate may be carried forward
+
+class RateError(Exception):
+    pass
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+def to_day(value):
+    """Days since 1970-01-01 for a date, an ISO "YYYY-MM-DD" string or a day number."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+def from_day(day):
+    return EPOCH + datetime.timedelta(days=day)
+
+def rate_store_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "rates.bin")
+
+def _iter_ecb_xml(path):
+    """Yield (date string, {currency: rate}) per day without keeping the tree."""
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if not elem.tag.endswith("Cube") or "time" not in elem.attrib:
+            continue
+        rates = {child.get("currency"): float(child.get("rate")) for child in elem if child.get("currency")}
+        yield elem.get("time"), rates
+        elem.clear()
+
+def _iter_ecb_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            rates = {}
+            for name, value in zip(header[1:], row[1:]):
+                value = value.strip()
+                if name and value and value != "N/A":
+                    rates[name] = float(value)
+            yield row[0].strip(), rates
+
+def import_rates(source_path, out_path=None):
+    """Stream-parse an ECB XML/CSV rate file into the binary store; returns (days, currencies)."""
+    out_path = out_path or rate_store_path()
+    rows = _iter_ecb_csv(source_path) if source_path.lower().endswith(".csv") else _iter_ecb_xml(source_path)
+    by_day = {}
+    currencies = {}
+    for date_text, rates in rows:
+        by_day[to_day(date_text)] = rates
+        for code in rates:
+            currencies.setdefault(code, len(currencies))
+    if not by_day:
+        raise RateError("Файлът не съдържа курсове.")
+    codes = sorted(currencies)
+    days = sorted(by_day)
+    nan = float("nan")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + HEADER.pack(len(days), len(codes)))
+        names = "".join(codes).encode("ascii")
+        f.write(names.ljust(_pad8(len(names)), b"\0"))
+        dates = struct.pack(f"<{len(days)}I", *days)
+        f.write(dates.ljust(_pad8(len(dates)), b"\0"))
+        row = struct.Struct(f"<{len(codes)}d")
+        for day in days:
+            rates = by_day[day]
+            f.write(row.pack(*(rates.get(code, nan) for code in codes)))
+    os.replace(tmp_path, out_path)
+    return len(days), len(codes)
+
+class RateStore:
+    """Memory-mapped rate file; a lookup is a binary search over the dates plus an index."""
+    def __init__(self, path=None):
+        self.path = path or rate_store_path()
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise RateError("Невалиден файл с курсове.")
+        day_count, currency_count = HEADER.unpack_from(self._mm, len(MAGIC))
+        offset = len(MAGIC) + HEADER.size
+        names = self._mm[offset:offset + 3 * currency_count].decode("ascii")
+        self.currencies = [names[i:i + 3] for i in range(0, len(names), 3)]
+        self._index = {code: i for i, code in enumerate(self.currencies)}
+        offset += _pad8(3 * currency_count)
+        view = memoryview(self._mm)
+        self.days = view[offset:offset + 4 * day_count].cast("I")
+        offset += _pad8(4 * day_count)
+        self.rates = view[offset:offset + 8 * day_count * currency_count].cast("d")
+
+    def close(self):
+        self.days.release()
+        self.rates.release()
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def first_date(self):
+        return from_day(self.days[0])
+
+    @property
+    def last_date(self):
+        return from_day(self.days[-1])
+
+    def rate_at(self, currency, date):
+        """
+        Return (effective date, units of currency per 1 EUR) published on or
+        before date; weekends and holidays use the last published rate.
+        """
+        if currency == BASE_CURRENCY:
+            return from_day(to_day(date)), 1.0
+        column = self._index.get(currency)
+        if column is None:
+            raise RateError(f"Няма курсове за {currency}.")
+        day = to_day(date)
+        i = bisect.bisect_right(self.days, day) - 1
+        width = len(self.currencies)
+        while i >= 0 and day - self.days[i] <= MAX_GAP_DAYS:
+            rate = self.rates[i * width + column]
+            if not math.isnan(rate):
+                return from_day(self.days[i]), rate
+            i -= 1
+        raise RateError(f"Няма курс за {currency} към {from_day(day).isoformat()}.")
+
+    def convert(self, amount, from_currency, to_currency, date):
+        """Convert amount at the rates valid on date, rounded to 2 decimals."""
+        return round(float(amount) * self._factor(from_currency, to_currency, to_day(date)), 2)
+
+    def _factor(self, from_currency, to_currency, day):
+        return self.rate_at(to_currency, day)[1] / self.rate_at(from_currency, day)[1]
+
+    def convert_many(self, items, from_currency, to_currency):
+        """
+        Convert (date, amount) pairs; rates are looked up once per distinct
+        date. Returns the converted amounts in input order.
+        """
+        factors = {}
+        results = []
+        for date, amount in items:
+            day = to_day(date)
+            factor = factors.get(day)
+            if factor is None:
+                factor = self._factor(from_currency, to_currency, day)
+                factors[day] = factor
+            results.append(round(float(amount) * factor, 2))
+        return results
+
+def load_store(path=None):
+    """
+    Open the store, importing an ECB file shipped next to the program on
+    first use. Returns None when there are no rates at all.
+    """
+    path = path or rate_store_path()
+    if not os.path.exists(path):
+        app_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+        for name in BUNDLED_RATES:
+            source = os.path.join(app_dir, name)
+            if os.path.exists(source):
+                import_rates(source, path)
+                break
+        else:
+            return None
+    return RateStore(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        count, currencies = import_rates(sys.argv[2])
+        print(f"{count} days, {currencies} currencies -> {rate_store_path()}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "rate":
+        with RateStore() as store:
+            effective, rate = store.rate_at(sys.argv[2].upper(), sys.argv[3])
+            print(f"1 EUR = {rate} {sys.argv[2].upper()} ({effective.isoformat()})")
+    else:
+        print("usage: python rate_store.py import FILE.xml|FILE.csv")
+        print("       python rate_store.py rate CURRENCY YYYY-MM-DD")
+        sys.exit(1)
@@ -0,0 +1,142 @@
+# receipt.py
+#
+# Change slips for ESC/POS thermal printers. A template is compiled once
+# into a list of ready byte strings (printer commands and cp866 text) and
+# field slots; printing a slip only formats the field values and joins
+# the bytes. Slips are written by a worker thread to the "printer_path"
+# setting: a device (/dev/usb/lp0, \\.\COM3, a shared printer), or a plain
+# file or pty that stands in for the printer.
+
+import os
+import re
+import time
+import queue
+import string
+import threading
+from functools import lru_cache
+
+from calculator import format_cents
+
+ENCODING = "cp866"
+LINE_WIDTH = 32  # characters on 58 mm paper in the default font
+QUEUE_SIZE = 16
+
+ESC = b"\x1b"
+GS = b"\x1d"
+COMMANDS = {
+    "init": ESC + b"@" + ESC + b"t\x11",  # reset, code page 17 (PC866 Cyrillic)
+    "left": ESC + b"a\x00",
+    "center": ESC + b"a\x01",
+    "bold": ESC + b"E\x01",
+    "/bold": ESC + b"E\x00",
+    "double": GS + b"!\x11",  # double width and height: half as many characters per line
+    "/double": GS + b"!\x00",
+    "cut": GS + b"V\x42\x00",  # feed to the cutter and cut
+}
+TAG = re.compile(r"<(/?\w+)>")
+
+RULE = "-" * LINE_WIDTH
+CHANGE_SLIP = (
+    "<init><center><bold>БЕЛЕЖКА ЗА РЕСТО</bold>\n"
+    "{date}\n"
+    "<left>" + RULE + "\n"
+    "Цена:{price:>27}\n"
+    "Платено:{paid:>24}\n"
+    "Курс: 1 EUR = 1.95583 лв.\n"
+    + RULE + "\n"
+    "<bold><double>Ресто:{change:>10}</double></bold>\n"
+    "\n\n\n<cut>"
+)
+
+class CompiledTemplate:
+    """Template as byte chunks plus (field, format spec) slots, filled in by render()."""
+    def __init__(self, parts):
+        self.parts = parts
+
+    def render(self, values):
+        return b"".join(
+            part if isinstance(part, bytes) else format(values[part[0]], part[1]).encode(ENCODING, "replace")
+            for part in self.parts
+        )
+
+@lru_cache(maxsize=None)
+def compile_template(template):
+    """Parse <tags> and {field:spec} slots once; adjacent fixed bytes are merged."""
+    parts = []
+
+    def add(chunk):
+        if parts and isinstance(parts[-1], bytes):
+            parts[-1] += chunk
+        else:
+            parts.append(chunk)
+
+    for i, piece in enumerate(TAG.split(template)):
+        if i % 2:
+            add(COMMANDS[piece])
+            continue
+        for literal, field, spec, _ in string.Formatter().parse(piece):
+            if literal:
+                add(literal.encode(ENCODING))
+            if field is not None:
+                parts.append((field, spec or ""))
+    return CompiledTemplate(parts)
+
+def change_slip(transaction, when=None):
+    """ESC/POS bytes for a ChangeWidget.transaction() dict (amounts in cents)."""
+    paid = []
+    if transaction["paid_bgn"]:
+        paid.append(f"{format_cents(transaction['paid_bgn'])} лв.")
+    if transaction["paid_eur"]:
+        paid.append(f"{format_cents(transaction['paid_eur'])} EUR")  # no € in cp866
+    return compile_template(CHANGE_SLIP).render({
+        "date": time.strftime("%d.%m.%Y %H:%M", time.localtime(when)),
+        "price": f"{format_cents(transaction['bgn'])} лв.",
+        "paid": " + ".join(paid),
+        "change": f"{format_cents(transaction['eur'])} EUR",
+    })
+
+class PrinterWorker(threading.Thread):
+    """Writes queued jobs to their printer paths, one at a time, off the GUI thread."""
+    def __init__(self, queue_size=QUEUE_SIZE):
+        super().__init__(daemon=True, name="receipt-printer")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.printed = 0
+        self.last_error = None
+
+    def submit(self, path, data):
+        """Queue a job; False when the printer is too far behind to take more."""
+        try:
+            self.queue.put_nowait((path, data))
+            return True
+        except queue.Full:
+            return False
+
+    def run(self):
+        while True:
+            path, data = self.queue.get()
+            try:
+                # Append to a stand-in file; open devices for plain writing
+                mode = "ab" if not os.path.exists(path) or os.path.isfile(path) else "wb"
+                with open(path, mode, buffering=0) as f:
+                    f.write(data)
+                self.printed += 1
+                self.last_error = None
+            except OSError as e:
+                self.last_error = f"{path}: {e}"
+                print("Printing failed:", self.last_error)
+
+_worker = None
+
+def get_printer():
+    global _worker
+    if _worker is None:
+        _worker = PrinterWorker()
+        _worker.start()
+    return _worker
+
+def current():
+    return _worker
+
+def print_change(path, transaction):
+    """Render and queue a change slip; returns False when it could not be queued."""
+    return get_printer().submit(path, change_slip(transaction))
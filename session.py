@@ -0,0 +1,169 @@
+# session.py
+#
+# Warm-restart snapshot of what the cashiers were doing, so the windows
+# come back as they were after an update, a crash or a Windows login.
+# Per register it holds the page, the converter input and direction, the
+# change page's price and tender buffers, and the basket; it also holds
+# the theme setting. session.bin is a few hundred bytes of packed binary:
+#   b"BGNSESS2" <u8 theme setting> <u8 register count>
+#   per register:
+#     <u8 page> <u8 return page> <u8 flags> <i64 exact price (calculator.to_units)>
+#     converter input, paid BGN, paid EUR, basket entry: <u8 length> UTF-8
+#     <u16 basket item count>, then per item <i64 cents> <u8 1 if BGN>
+# It is packed on the GUI thread shortly after input stops changing and
+# written on the task pool; at exit it is written directly. Startup reads
+# it once, before the first paint.
+
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from PyQt5.QtCore import QTimer
+
+from settings import get_user_settings_path
+import tasks
+
+MAGIC = b"BGNSESS2"  # version 1 held the price as rounded BGN cents
+HEADER = struct.Struct("<BB")
+REGISTER = struct.Struct("<BBBq")
+TEXT_LENGTH = struct.Struct("<B")
+COUNT = struct.Struct("<H")
+ITEM = struct.Struct("<qB")
+SAVE_DELAY_MS = 500  # a snapshot at most this long after a change, however fast the typing
+
+FLAG_BGN_TO_EUR = 1
+FLAG_TENDER_EUR = 2
+FLAG_BASKET_BGN = 4
+
+RegisterState = namedtuple("RegisterState", [
+    "page", "return_page", "bgn_to_eur", "tender_eur", "basket_bgn", "price_units",
+    "input", "paid_bgn", "paid_eur", "basket_entry", "basket_items",  # items: (cents, in BGN)
+])
+Session = namedtuple("Session", ["theme", "registers"])
+
+class SessionError(ValueError):
+    pass
+
+def session_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "session.bin")
+
+def _pack_text(text):
+    data = text.encode("utf-8")[:255]
+    return TEXT_LENGTH.pack(len(data)) + data
+
+def pack(session):
+    parts = [MAGIC, HEADER.pack(session.theme, len(session.registers))]
+    for state in session.registers:
+        flags = (
+            (FLAG_BGN_TO_EUR if state.bgn_to_eur else 0)
+            | (FLAG_TENDER_EUR if state.tender_eur else 0)
+            | (FLAG_BASKET_BGN if state.basket_bgn else 0)
+        )
+        parts.append(REGISTER.pack(state.page, state.return_page, flags, state.price_units))
+        for text in (state.input, state.paid_bgn, state.paid_eur, state.basket_entry):
+            parts.append(_pack_text(text))
+        items = state.basket_items[:0xFFFF]
+        parts.append(COUNT.pack(len(items)))
+        parts.extend(ITEM.pack(cents, bool(bgn)) for cents, bgn in items)
+    return b"".join(parts)
+
+def unpack(data):
+    if not data.startswith(MAGIC):
+        raise SessionError("not a session snapshot")
+    try:
+        offset = len(MAGIC)
+        theme_setting, count = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        registers = []
+        for _ in range(count):
+            page, return_page, flags, price = REGISTER.unpack_from(data, offset)
+            offset += REGISTER.size
+            texts = []
+            for _ in range(4):
+                (length,) = TEXT_LENGTH.unpack_from(data, offset)
+                offset += TEXT_LENGTH.size
+                texts.append(data[offset:offset + length].decode("utf-8", "ignore"))
+                offset += length
+            (item_count,) = COUNT.unpack_from(data, offset)
+            offset += COUNT.size
+            items = [ITEM.unpack_from(data, offset + i * ITEM.size) for i in range(item_count)]
+            offset += item_count * ITEM.size
+            registers.append(RegisterState(
+                page, return_page, bool(flags & FLAG_BGN_TO_EUR), bool(flags & FLAG_TENDER_EUR),
+                bool(flags & FLAG_BASKET_BGN), price, *texts, [(cents, bool(bgn)) for cents, bgn in items],
+            ))
+    except struct.error:
+        raise SessionError("truncated session snapshot")
+    return Session(theme_setting, registers)
+
+def load(path=None):
+    """The saved Session, or None when there is none or it cannot be read."""
+    try:
+        with open(path or session_path(), "rb") as f:
+            return unpack(f.read())
+    except (OSError, SessionError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print("Session snapshot ignored:", e)
+        return None
+
+def save(data, path=None):
+    # Swap in a complete file, so a crash mid-write keeps the previous snapshot
+    path = path or session_path()
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+class SessionSaver:
+    """
+    Debounced snapshot writer. capture() returns the current Session; it
+    is called on the GUI thread SAVE_DELAY_MS after the first change.
+    Unchanged snapshots are not written again.
+    """
+    def __init__(self, capture, path=None, delay_ms=SAVE_DELAY_MS):
+        self.capture = capture
+        self.path = path or session_path()
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.save_soon)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._written = 0
+        self._last = None
+
+    def mark_dirty(self):
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def _snapshot(self):
+        self.timer.stop()
+        data = pack(self.capture())
+        if data == self._last:
+            return None
+        self._last = data
+        self._sequence += 1
+        return self._sequence, data
+
+    def save_soon(self):
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            tasks.submit("save_session", self.write, *snapshot, priority=tasks.PRIORITY_LOW)
+
+    def save_now(self):
+        """Write on the calling thread (at exit)."""
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            self.write(*snapshot)
+
+    def write(self, sequence, data):
+        with self._lock:
+            if sequence <= self._written:
+                return False
+            try:
+                save(data, self.path)
+            except OSError as e:
+                print("Could not save session:", e)
+                return False
+            self._written = sequence
+            return True
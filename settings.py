@@ -3,6 +3,8 @@
 import os
 import sys
 import json
+import threading
+from collections import namedtuple
 
 DEFAULT_SETTINGS = {
     "start_with_windows": False,
@@ -15,9 +17,98 @@ DEFAULT_SETTINGS = {
     "last_direction_bgn_to_eur": True,
     "x": None,
     "y": None,
-    "minimal_mode": False
+    "minimal_mode": False,
+    "diagnostics_enabled": False,
+    "profiling_enabled": False,
+    "register_count": 1,
+    "idle_trim_minutes": 10,
+    "sync_url": "",
+    "till_id": "",
+    "printer_path": ""
 }
 
+# Keys that each register (cashier window) keeps for itself
+PER_REGISTER_KEYS = ("x", "y", "minimal_mode", "always_on_top", "last_direction_bgn_to_eur")
+
+SettingChange = namedtuple("SettingChange", ["key", "old", "new"])
+
+class SettingsModel(dict):
+    """
+    Settings dict that diffs every write and notifies subscribers with
+    SettingChange events for only the keys that actually changed.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._subscribers = []
+
+    def subscribe(self, keys, callback):
+        """Call callback(changes) when any of keys change; keys=None means every key."""
+        subscription = (frozenset(keys) if keys is not None else None, callback)
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, *args, **kwargs):
+        changes = []
+        for key, value in dict(*args, **kwargs).items():
+            if key in self and self[key] == value:
+                continue
+            changes.append(SettingChange(key, self.get(key), value))
+            super().__setitem__(key, value)
+        if changes:
+            for keys, callback in list(self._subscribers):
+                relevant = [c for c in changes if keys is None or c.key in keys]
+                if relevant:
+                    callback(relevant)
+        return changes
+
+class RegisterSettings:
+    """
+    One register's view of the shared SettingsModel. PER_REGISTER_KEYS get
+    a "_<number>" suffix from the second register on; all other keys are
+    shared. Register 1 keeps the plain keys, so old settings files still load.
+    """
+    def __init__(self, model, number):
+        self.model = model
+        self.number = number
+
+    def _key(self, key):
+        if self.number > 1 and key in PER_REGISTER_KEYS:
+            return f"{key}_{self.number}"
+        return key
+
+    def get(self, key, default=None):
+        return self.model.get(self._key(key), default)
+
+    def __getitem__(self, key):
+        return self.model[self._key(key)]
+
+    def __setitem__(self, key, value):
+        self.model[self._key(key)] = value
+
+    def __contains__(self, key):
+        return self._key(key) in self.model
+
+    def update(self, *args, **kwargs):
+        return self.model.update({self._key(k): v for k, v in dict(*args, **kwargs).items()})
+
+    def subscribe(self, keys, callback):
+        """Like SettingsModel.subscribe, with changes reported under the unsuffixed keys."""
+        if keys is None:
+            return self.model.subscribe(None, callback)
+        names = {self._key(k): k for k in keys}
+        return self.model.subscribe(names, lambda changes: callback(
+            [SettingChange(names[c.key], c.old, c.new) for c in changes]))
+
+    def unsubscribe(self, subscription):
+        self.model.unsubscribe(subscription)
+
 def get_user_settings_path():
     appdata = os.environ.get('APPDATA', os.path.expanduser('~'))
     settings_folder = os.path.join(appdata, "BGN_EUR_Converter")
@@ -30,19 +121,45 @@ def load_settings():
     if os.path.exists(path):
         try:
             with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+                return SettingsModel(json.load(f))
         except Exception:
             pass
-    return DEFAULT_SETTINGS.copy()
+    return SettingsModel(DEFAULT_SETTINGS)
 
 def save_settings(settings):
+    # Write a temporary file and swap it in, so a crash never leaves half a settings file
     path = get_user_settings_path()
     try:
-        with open(path, "w", encoding="utf-8") as f:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
             json.dump(settings, f)
+        os.replace(path + ".tmp", path)
     except Exception:
         pass
 
+class SettingsWriter:
+    """
+    Saves settings snapshots from background threads. Each snapshot gets a
+    sequence number on the GUI thread; one that reaches the file after a
+    newer snapshot was written is dropped, so the newest settings win.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._written = 0
+
+    def snapshot(self, settings):
+        """(sequence, copy of settings); call on the thread that changes the settings."""
+        self._sequence += 1
+        return self._sequence, dict(settings)
+
+    def write(self, sequence, data):
+        with self._lock:
+            if sequence <= self._written:
+                return False
+            save_settings(data)
+            self._written = sequence
+            return True
+
 def get_theme(settings):
     idx = settings.get("theme", 2)
     if idx == 2:
@@ -0,0 +1,157 @@
+# sync_agent.py
+#
+# Optional push of the till log (till_log.py) to the store collector
+# (sync_collector.py), turned on by the "sync_url" setting. A background
+# thread sends everything after the last acknowledged byte offset as
+# gzip-compressed batches of whole lines. The collector answers with the
+# offset it now holds, and that offset is saved in sync_state.json.
+# - A batch sent twice (say the reply was lost) is stored only once.
+# - A failed push is retried with exponential backoff.
+# - The GUI thread never waits on the network.
+
+import os
+import json
+import gzip
+import time
+import random
+import socket
+import threading
+
+import http_client
+import till_log
+from settings import get_user_settings_path
+
+BATCH_BYTES = 256 * 1024
+SYNC_INTERVAL = 60.0  # seconds between pushes when nothing new is logged
+MIN_INTERVAL = 5.0  # gather a few records before pushing after a wake-up
+BACKOFF_START = 2.0
+BACKOFF_MAX = 300.0
+TIMEOUT = 10
+
+class SyncError(IOError):
+    pass
+
+def sync_state_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "sync_state.json")
+
+def default_till_id():
+    return socket.gethostname() or "till"
+
+class SyncAgent(threading.Thread):
+    def __init__(self, url, till_id, log_path=None, state_path=None, interval=SYNC_INTERVAL):
+        super().__init__(daemon=True, name="sync-agent")
+        self.url = url.rstrip("/") + "/ingest"
+        self.till_id = till_id
+        self.log_path = log_path or till_log.till_log_path()
+        self.state_path = state_path or sync_state_path()
+        self.interval = interval
+        self.offset = self._load_offset()
+        self.last_sync = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def _load_offset(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("url") == self.url and state.get("till") == self.till_id:
+                return int(state["offset"])
+        except Exception:
+            pass
+        return 0
+
+    def _save_offset(self, offset):
+        self.offset = offset
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": self.url, "till": self.till_id, "offset": offset}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def wake(self):
+        """New records were logged; push them soon."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        delay = 0.0
+        while not self._stop_event.is_set():
+            try:
+                while self.push_once() and not self._stop_event.is_set():
+                    pass
+                delay = 0.0
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                delay = min(BACKOFF_MAX, delay * 2 if delay else BACKOFF_START)
+            if delay:
+                # Jitter keeps the tills of a store from retrying in step
+                self._stop_event.wait(delay * random.uniform(0.8, 1.2))
+            else:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                self._stop_event.wait(MIN_INTERVAL)
+
+    def _read_batch(self):
+        """Whole lines after the acknowledged offset, at most BATCH_BYTES."""
+        if not os.path.exists(self.log_path):
+            return b""
+        size = os.path.getsize(self.log_path)
+        if size < self.offset:
+            raise SyncError("Дневникът е по-къс от изпратеното; синхронизацията е спряна.")
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(BATCH_BYTES)
+        return data[:data.rfind(b"\n") + 1]
+
+    def push_once(self):
+        """Send the next batch; returns False when there was nothing new to send."""
+        data = self._read_batch()
+        if not data:
+            return False
+        response = http_client.get_session().post(
+            self.url,
+            data=gzip.compress(data),
+            headers={
+                "Content-Type": "application/x-ndjson",
+                "Content-Encoding": "gzip",
+                "X-Till-Id": self.till_id,
+                "X-Offset": str(self.offset),
+            },
+            timeout=TIMEOUT,
+        )
+        if response.status_code not in (200, 409):
+            response.raise_for_status()
+            raise SyncError(f"HTTP {response.status_code}")
+        previous = self.offset
+        # 409: the collector holds a different offset (a reset on either side); continue from its offset
+        self._save_offset(int(response.json()["offset"]))
+        self.last_sync = time.time()
+        return response.status_code == 409 or self.offset > previous
+
+_agent = None
+
+def start(url, till_id=None):
+    """Start logging and pushing; a running agent is replaced."""
+    global _agent
+    stop()
+    log = till_log.start()
+    _agent = SyncAgent(url, till_id or default_till_id(), log_path=log.path)
+    log.on_append = _agent.wake
+    _agent.start()
+    return _agent
+
+def stop():
+    global _agent
+    if _agent is not None:
+        _agent.stop()
+        log = till_log.current()
+        if log is not None:
+            log.on_append = None
+        _agent = None
+
+def current():
+    return _agent
@@ -0,0 +1,172 @@
+# sync_collector.py
+#
+# Small collector for the tills' sync agents (sync_agent.py). Run it on any
+# PC in the store, or locally as a stand-in for the head office service:
+#   python sync_collector.py [port] [database]
+# POST /ingest stores a gzip batch of till log lines. It is idempotent by
+# byte offset, so a batch sent twice is stored once.
+# GET /summary?day=YYYY-MM-DD returns the figures for that day, per till
+# and for the whole store.
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_PORT = 8765
+MAX_BODY = 8 * 1024 * 1024
+MAX_BATCH = 64 * 1024 * 1024  # decompressed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tills (
+    till TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    till TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    type TEXT NOT NULL,
+    bgn_cents INTEGER NOT NULL,
+    eur_cents INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (till, offset)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_day ON events (day);
+"""
+
+class Collector:
+    def __init__(self, path="collector.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def offset(self, till):
+        row = self.conn.execute("SELECT offset FROM tills WHERE till = ?", (till,)).fetchone()
+        return row[0] if row else 0
+
+    def ingest(self, till, offset, data):
+        """
+        Store the complete lines of data, which starts at byte offset of the
+        till's log. Returns (accepted, offset now held): lines below the held
+        offset were stored before and are skipped; a batch starting past it
+        is refused so the agent resends from the held offset.
+        """
+        with self.lock, self.conn:
+            held = self.offset(till)
+            if offset > held:
+                return False, held
+            rows = []
+            position = offset
+            for line in data.splitlines(keepends=True):
+                start = position
+                position += len(line)
+                if not line.endswith(b"\n"):
+                    position = start  # an incomplete last line is not acknowledged
+                    break
+                if start < held:
+                    continue
+                try:
+                    record = json.loads(line)
+                    rows.append((
+                        till, start, str(record["day"]), str(record["type"]),
+                        int(record.get("bgn", 0)), int(record.get("eur", 0)), line.decode("utf-8").rstrip("\n"),
+                    ))
+                except (ValueError, KeyError, TypeError):
+                    print(f"Skipping bad line from {till} at {start}")
+            self.conn.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            held = max(held, position)
+            self.conn.execute(
+                "INSERT INTO tills VALUES (?, ?, ?) ON CONFLICT (till) DO UPDATE SET offset = excluded.offset, last_seen = excluded.last_seen",
+                (till, held, time.time()),
+            )
+            return True, held
+
+    def summary(self, day):
+        """Count and BGN/EUR cent totals per event type, per till and for the store."""
+        tills = {}
+        store = {}
+        for till, kind, count, bgn, eur in self.conn.execute(
+            "SELECT till, type, COUNT(*), SUM(bgn_cents), SUM(eur_cents) FROM events WHERE day = ? GROUP BY till, type",
+            (day,),
+        ):
+            tills.setdefault(till, {})[kind] = {"count": count, "bgn_cents": bgn, "eur_cents": eur}
+            total = store.setdefault(kind, {"count": 0, "bgn_cents": 0, "eur_cents": 0})
+            total["count"] += count
+            total["bgn_cents"] += bgn
+            total["eur_cents"] += eur
+        return {"day": day, "store": store, "tills": tills}
+
+def _decompress(body):
+    decompressor = zlib.decompressobj(wbits=31)  # gzip
+    data = decompressor.decompress(body, MAX_BATCH)
+    if decompressor.unconsumed_tail:
+        raise ValueError("batch too large")
+    return data
+
+def make_handler(collector):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/ingest":
+                return self._reply(404, {"error": "not found"})
+            till = self.headers.get("X-Till-Id", "").strip()
+            try:
+                offset = int(self.headers.get("X-Offset", ""))
+                length = int(self.headers.get("Content-Length", ""))
+            except ValueError:
+                return self._reply(400, {"error": "X-Offset and Content-Length are required"})
+            if not till or len(till) > 64 or offset < 0:
+                return self._reply(400, {"error": "bad till id or offset"})
+            if length > MAX_BODY:
+                return self._reply(413, {"error": "batch too large"})
+            body = self.rfile.read(length)
+            try:
+                data = _decompress(body) if self.headers.get("Content-Encoding") == "gzip" else body
+            except (ValueError, zlib.error) as e:
+                return self._reply(400, {"error": str(e)})
+            accepted, held = collector.ingest(till, offset, data)
+            self._reply(200 if accepted else 409, {"offset": held})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/summary":
+                return self._reply(404, {"error": "not found"})
+            day = parse_qs(url.query).get("day", [time.strftime("%Y-%m-%d")])[0]
+            self._reply(200, collector.summary(day))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(port=DEFAULT_PORT, path="collector.sqlite"):
+    collector = Collector(path)
+    server = ThreadingHTTPServer(("", port), make_handler(collector))
+    print(f"Collector on port {port}, data in {os.path.abspath(path)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 or (len(sys.argv) > 1 and not sys.argv[1].isdigit()):
+        print("usage: python sync_collector.py [port] [database]")
+        sys.exit(1)
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT, sys.argv[2] if len(sys.argv) > 2 else "collector.sqlite")
@@ -0,0 +1,188 @@
+# tasks.py
+#
+# One shared background executor, a bounded QThreadPool, for work that
+# must stay off the GUI thread: update checks and downloads, settings
+# writes, and rendering documents. Callbacks get results, errors and
+# progress through Qt signals, so they run on the GUI thread.
+# - Higher priorities start first.
+# - A task can be cancelled while it is still queued. A running task
+#   stops at its next check().
+# - Each finished task adds its wait and run time to a per-name timer.
+
+import time
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5 import sip
+
+MAX_THREADS = 4
+PRIORITY_LOW = 0  # nobody waits for it (settings writes)
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2  # the user is looking at a placeholder (documents)
+
+_local = threading.local()
+
+class Cancelled(Exception):
+    pass
+
+class TaskSignals(QObject):
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(int)
+    done = pyqtSignal()
+
+class Task(QRunnable):
+    def __init__(self, executor, name, func, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # the executor keeps it until done, for cancel() and timing
+        self.executor = executor
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.ended = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Drop a queued task; a running one stops at its next check() and reports nothing."""
+        self._cancel.set()
+        if self.executor.pool.tryTake(self):
+            self.executor._forget(self)
+
+    def check(self):
+        """Call from inside the task: raises Cancelled once cancel() was called."""
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def report(self, percent):
+        """Progress from inside the task, delivered to on_progress on the GUI thread."""
+        self.check()
+        self.signals.progress.emit(int(percent))
+
+    def run(self):
+        _local.task = self
+        self.started = time.perf_counter()
+        try:
+            self.check()
+            result = self.func(*self.args, **self.kwargs)
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            print(f"Task {self.name} failed:", e)
+            if not self.cancelled:
+                self.signals.error.emit(e)
+        finally:
+            self.ended = time.perf_counter()
+            _local.task = None
+            self.executor._record(self)
+            self.signals.done.emit()
+
+class TaskTimer:
+    __slots__ = ("count", "wait_total", "run_total", "run_max")
+
+    def __init__(self):
+        self.count = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+class Executor:
+    def __init__(self, max_threads=MAX_THREADS):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.timers = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, priority=PRIORITY_NORMAL, on_result=None, on_error=None,
+               on_progress=None, **kwargs):
+        """Run func(*args, **kwargs) on the pool; the callbacks are called on the GUI thread."""
+        task = Task(self, name, func, args, kwargs)
+        if on_result:
+            task.signals.result.connect(on_result)
+        if on_error:
+            task.signals.error.connect(on_error)
+        if on_progress:
+            task.signals.progress.connect(on_progress)
+        task.signals.done.connect(lambda: self._forget(task))
+        self._tasks.add(task)
+        self.pool.start(task, priority)
+        return task
+
+    def _forget(self, task):
+        self._tasks.discard(task)
+
+    def _record(self, task):
+        with self._lock:
+            timer = self.timers.setdefault(task.name, TaskTimer())
+            timer.count += 1
+            timer.wait_total += task.started - task.submitted
+            run = task.ended - task.started
+            timer.run_total += run
+            timer.run_max = max(timer.run_max, run)
+
+    def wait(self, msecs=-1):
+        """Block until queued and running tasks are done; False on timeout."""
+        return self.pool.waitForDone(msecs)
+
+    def busy(self):
+        """True while any task is queued or running."""
+        return bool(self._tasks)
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def shutdown(self, msecs):
+        """
+        At exit: cancel everything and give running tasks msecs to stop.
+        A task still stuck after that (a network read, say) must not keep
+        the process alive, so the pool, whose destructor would wait for
+        it, is handed to C++ and never destroyed.
+        """
+        self.cancel_all()
+        if self.pool.waitForDone(msecs):
+            return True
+        sip.transferto(self.pool, None)
+        for task in self._tasks:
+            sip.transferto(task, None)
+        return False
+
+    def timing_summaries(self):
+        with self._lock:
+            return {
+                name: {
+                    "count": t.count,
+                    "mean_wait_ms": t.wait_total / t.count * 1000,
+                    "mean_run_ms": t.run_total / t.count * 1000,
+                    "max_run_ms": t.run_max * 1000,
+                }
+                for name, t in self.timers.items()
+            }
+
+_executor = None
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = Executor()
+    return _executor
+
+def submit(name, func, *args, **kwargs):
+    return get_executor().submit(name, func, *args, **kwargs)
+
+def busy():
+    return _executor is not None and _executor.busy()
+
+def current_task():
+    """The task running on this thread, or None outside the pool."""
+    return getattr(_local, "task", None)
@@ -0,0 +1,160 @@
+# theme.py
+#
+# Light and dark themes as colour tables, compiled once into a single
+# application stylesheet: the rules of every theme are scoped by a "theme"
+# property on the top-level windows, so switching themes only flips that
+# property and re-polishes those windows instead of parsing a stylesheet
+# and restyling every widget in the process. Widgets carry an objectName
+# or a dynamic property such as "compact" and set no stylesheets of their own.
+
+from functools import lru_cache
+
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtGui import QPalette, QColor
+
+THEMES = {
+    "light": {
+        "fg": "#2b2b2b",
+        "window_bg": "#fafafa",
+        "dialog_bg": "#fafafa",
+        "dialog_paint": "#fafafa",
+        "tab_selected": "#cccccc",
+        "panel": "rgba(64,68,80,0.08)",
+        "button": "#e8e8e8",
+        "button_fg": "#223",
+        "button_hover": "#d4d4d4",
+        "button_pressed": "#c3c3c3",
+        "note_fg": "#000000",
+        "highlight": "#3874d8",
+        "highlight_fg": "#ffffff",
+        "alternate_bg": "#f0f0f0",
+        "tooltip_bg": "#ffffdc",
+        "tooltip_fg": "#000000",
+    },
+    "dark": {
+        "fg": "#e0e0e0",
+        "window_bg": "#222222",
+        "dialog_bg": "#333333",
+        "dialog_paint": "#222222",
+        "tab_selected": "#393939",
+        "panel": "rgba(64,68,80,0.13)",
+        "button": "#313640",
+        "button_fg": "#eee",
+        "button_hover": "#374151",
+        "button_pressed": "#2d3848",
+        "note_fg": "#eeeeee",
+        "highlight": "#2f5fa8",
+        "highlight_fg": "#ffffff",
+        "alternate_bg": "#2b2b2b",
+        "tooltip_bg": "#3a3f4b",
+        "tooltip_fg": "#eeeeee",
+    },
+}
+
+# Rules that do not depend on the theme
+BASE_STYLESHEET = """
+#appWindow QLabel { background: transparent; }
+#appWindow QPushButton#switchButton {
+    font-size: 32px; color: #dddddd; border: none; background: #aaaaaa; border-radius: 24px;
+}
+#appWindow QPushButton#switchButton[compact="true"] { font-size: 18px; border-radius: 16px; }
+#appWindow QPushButton#switchButton:hover { background: #cccccc; }
+#infoDialog QLabel, #infoDialog QCheckBox, #infoDialog QComboBox { background: transparent; }
+#infoDialog QLabel[role="note"], #infoDialog QLabel#noUpdateLabel { font-size: 12px; }
+#infoDialog QLabel#latestLabel { font-weight: bold; }
+#infoDialog QTabWidget::pane { border: none; background: transparent; }
+#infoDialog QPushButton { background: #313640; color: #eee; border-radius: 8px; }
+#infoDialog QPushButton:hover { background: #374151; }
+#infoDialog QPushButton[role="update"] { border-radius: 8px; font-size: 15px; padding: 10px 0; }
+"""
+
+# Per theme; {t} is the theme name, doubled braces are literal
+THEME_STYLESHEET = """
+#appWindow[theme="{t}"] QLabel {{ color: {fg}; }}
+#infoDialog[theme="{t}"] {{ background: {dialog_bg}; color: {fg}; border-radius: 24px; }}
+#infoDialog[theme="{t}"] QLabel, #infoDialog[theme="{t}"] QCheckBox, #infoDialog[theme="{t}"] QComboBox {{ color: {fg}; }}
+#infoDialog[theme="{t}"] QLabel#noUpdateLabel {{ color: {note_fg}; }}
+#infoDialog[theme="{t}"] QTabBar::tab {{
+    background: {dialog_bg}; color: {fg}; border-radius: 8px 8px 0 0;
+    min-width: 100px; padding: 8px 2px; height: 28px; width: 115px; font-size: 13px;
+}}
+#infoDialog[theme="{t}"] QTabBar::tab:selected {{ background: {tab_selected}; color: {fg}; }}
+#infoDialog[theme="{t}"] QTextBrowser {{ background: {dialog_bg}; color: {fg}; }}
+#infoDialog[theme="{t}"] QWidget#updatesBlock, #infoDialog[theme="{t}"] QWidget#dataBlock {{ background: {panel}; border-radius: 12px; }}
+#infoDialog[theme="{t}"] QPushButton[role="update"] {{ background: {button}; color: {button_fg}; }}
+#infoDialog[theme="{t}"] QPushButton[role="update"]:hover {{ background: {button_hover}; }}
+#infoDialog[theme="{t}"] QPushButton[role="update"]:pressed {{ background: {button_pressed}; }}
+"""
+
+_active = None
+_installed = False
+
+def color(name, key):
+    return THEMES[name][key]
+
+@lru_cache(maxsize=None)
+def application_stylesheet():
+    """The one stylesheet for all themes, built on first use only."""
+    return BASE_STYLESHEET + "".join(
+        THEME_STYLESHEET.format(t=name, **colors) for name, colors in THEMES.items()
+    )
+
+@lru_cache(maxsize=None)
+def palette(name):
+    """
+    Complete palette for the widgets no stylesheet rule covers (line
+    edits, message boxes, windows without a theme). Every role a widget
+    draws with is set, so light text never lands on a default light button.
+    """
+    colors = THEMES[name]
+    # Derives the shades and the disabled colours from the button and window colours
+    result = QPalette(QColor(colors["button"]), QColor(colors["dialog_bg"]))
+    roles = {
+        QPalette.WindowText: colors["fg"],
+        QPalette.Text: colors["fg"],
+        QPalette.ButtonText: colors["button_fg"],
+        QPalette.Base: colors["dialog_bg"],
+        QPalette.AlternateBase: colors["alternate_bg"],
+        QPalette.Highlight: colors["highlight"],
+        QPalette.HighlightedText: colors["highlight_fg"],
+        QPalette.ToolTipBase: colors["tooltip_bg"],
+        QPalette.ToolTipText: colors["tooltip_fg"],
+    }
+    for group in (QPalette.Active, QPalette.Inactive):
+        for role, value in roles.items():
+            result.setColor(group, role, QColor(value))
+    result.setColor(QPalette.Disabled, QPalette.Base, QColor(colors["dialog_bg"]))
+    return result
+
+def attach(window):
+    """Put a top-level window under theme control; it starts in the active theme."""
+    window.setProperty("theme", _active or "light")
+
+def repolish(widget):
+    """Re-match stylesheet rules after changing a dynamic property on widget."""
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+
+def apply(name):
+    """Switch every attached window to a theme; a no-op when it is already active."""
+    global _active, _installed
+    app = QApplication.instance()
+    if not _installed:
+        app.setStyleSheet(application_stylesheet())
+        _installed = True
+    if name == _active:
+        return False
+    # Application-wide: widgets matched by a stylesheet rule take their base palette from the application
+    app.setPalette(palette(name))
+    for window in app.topLevelWidgets():
+        if window.property("theme") is not None:
+            window.setProperty("theme", name)
+            for widget in [window] + window.findChildren(QWidget):
+                repolish(widget)
+            window.update()
+    _active = name
+    return True
+
+def active():
+    return _active
@@ -0,0 +1,94 @@
+# till_log.py
+#
+# Append-only local log of committed till events: a price handed on to the
+# change page ("conversion") and a finished change calculation ("change"),
+# one JSON object per line in till_log.jsonl. The GUI thread only puts
+# records on a bounded queue; a writer thread appends them to the file, so
+# logging never waits on the disk. sync_agent.py ships the file to the
+# store collector by byte offset.
+
+import os
+import json
+import time
+import queue
+import threading
+
+from settings import get_user_settings_path
+
+QUEUE_SIZE = 1024  # records waiting for the writer; more are dropped, not blocked on
+WRITE_BATCH = 256
+
+def till_log_path():
+    return os.path.join(os.path.dirname(get_user_settings_path()), "till_log.jsonl")
+
+def encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+class TillLog(threading.Thread):
+    def __init__(self, path=None, queue_size=QUEUE_SIZE):
+        super().__init__(daemon=True, name="till-log")
+        self.path = path or till_log_path()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.on_append = None  # called from the writer thread after each write
+
+    def record(self, kind, **fields):
+        """Queue one event; never blocks the caller."""
+        now = time.time()
+        record = {"ts": round(now, 3), "day": time.strftime("%Y-%m-%d", time.localtime(now)), "type": kind}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        with open(self.path, "ab") as f:
+            running = True
+            while running:
+                records = [self.queue.get()]
+                # Whatever else is already queued goes into the same write
+                while len(records) < WRITE_BATCH:
+                    try:
+                        records.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in records:
+                    running = False
+                    records = records[:records.index(None)]
+                if records:
+                    f.write(b"".join(encode(r) for r in records))
+                    f.flush()
+                    if self.on_append:
+                        self.on_append()
+
+    def close(self, timeout=2.0):
+        """Write what is queued and stop the writer."""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.join(timeout)
+
+_log = None
+
+def start(path=None):
+    global _log
+    if _log is None:
+        _log = TillLog(path)
+        _log.start()
+    return _log
+
+def stop():
+    global _log
+    if _log is not None:
+        _log.close()
+        _log = None
+
+def current():
+    return _log
+
+def record(kind, **fields):
+    """Log a till event when logging is on; a no-op otherwise."""
+    if _log is not None:
+        _log.record(kind, **fields)
@@ -1,19 +1,92 @@
 import sys
 import os
-import requests
+import json
+import time
+import hashlib
 import tempfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QProgressBar, QLabel, QMessageBox
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
+from PyQt5.QtCore import Qt
 
-LATEST_JSON_URL = "https://raw.githubusercontent.com/zdravkopavlov/Currency-Coverter/main/latest_version.json"
+from version import VERSION
+from settings import get_user_settings_path
+from delta import apply_delta, file_sha256, DeltaError
+from http_client import MANIFEST_URL, fetch_manifest, get_session
+import tasks
 
-class DownloadSignals(QObject):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(str)
-    error = pyqtSignal(str)
+LATEST_JSON_URL = MANIFEST_URL
+MANIFEST_REUSE_SECONDS = 600  # reuse the manifest the app just fetched
+
+SEGMENT_COUNT = 4
+MIN_SEGMENT_SIZE = 512 * 1024
+CHUNK_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 0.25  # seconds between progress signals
+STATE_SAVE_INTERVAL = 1.0  # seconds between resume state writes
+KEEP_PAYLOADS = 2  # installers kept as delta sources (installed + downloaded)
+HASH_BUFFER_LIMIT = 32 * 1024 * 1024  # out-of-order bytes held for hashing before reading back
+
+class IntegrityError(IOError):
+    pass
+
+def payload_dir():
+    """Folder keeping the installer of the installed version, the source for delta updates."""
+    path = os.path.join(os.path.dirname(get_user_settings_path()), "updates")
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+def installed_payload_path(version=VERSION):
+    return os.path.join(payload_dir(), f"setup_{version}.exe")
+
+def retain_payload(installer_path, version):
+    """Keep a copy of the installer for version so the next update can be a delta."""
+    import shutil
+    target = installed_payload_path(version)
+    if os.path.abspath(installer_path) != os.path.abspath(target):
+        shutil.copyfile(installer_path, target)
+    payloads = sorted(
+        (os.path.join(payload_dir(), name) for name in os.listdir(payload_dir()) if name.startswith("setup_")),
+        key=os.path.getmtime, reverse=True
+    )
+    for old in payloads[KEEP_PAYLOADS:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+def try_delta_update(info, dest_path, on_progress=None, installed_version=VERSION, check=None):
+    """
+    Rebuild the new installer at dest_path from the retained installer of
+    installed_version plus the matching delta in info["deltas"].
+    Returns the bytes saved versus the full download, or None when no delta
+    applies (caller then downloads the full installer).
+    """
+    entry = (info.get("deltas") or {}).get(installed_version)
+    source_path = installed_payload_path(installed_version)
+    if not entry or not os.path.exists(source_path):
+        return None
+    try:
+        if entry.get("source_sha256") and file_sha256(source_path) != entry["source_sha256"]:
+            return None
+        delta_path = dest_path + ".delta"
+        SegmentedDownload(entry["url"], delta_path, on_progress=on_progress,
+                          expected_sha256=entry.get("sha256"), check=check).run()
+        delta_size = os.path.getsize(delta_path)
+        digest = apply_delta(source_path, delta_path, dest_path)
+        os.remove(delta_path)
+        expected = entry.get("target_sha256") or info.get("sha256")
+        if expected and digest != expected.lower():
+            os.remove(dest_path)
+            raise DeltaError("Контролната сума на сглобения инсталатор не съвпада.")
+        return max(0, os.path.getsize(dest_path) - delta_size)
+    except tasks.Cancelled:
+        raise  # stopping is not a reason to fall back to the full download
+    except Exception as e:
+        print("Delta update failed, falling back to full download:", e)
+        return None
 
 def run_installer_as_admin(installer_path):
     if sys.platform == "win32":
@@ -30,6 +103,231 @@ def run_installer_as_admin(installer_path):
     else:
         return False
 
+class SegmentedDownload:
+    """
+    Downloads url to dest_path over a few parallel HTTP Range requests into
+    a preallocated dest_path + ".part". Per-segment progress is kept in
+    dest_path + ".state", so a dropped connection or a restart resumes
+    instead of starting over. Servers without range support fall back to a
+    single stream.
+
+    With expected_sha256 the file is hashed while it arrives: bytes at the
+    hash position go straight into the hasher, chunks that other segments
+    write ahead of it wait in memory (up to HASH_BUFFER_LIMIT) and only
+    the overflow, or data left by an earlier run, is read back from disk.
+    A mismatch deletes the download and raises IntegrityError.
+
+    check, when given, is called for every chunk and stops the download by
+    raising (tasks.Task.check); the state file keeps it resumable.
+    """
+    def __init__(self, url, dest_path, segments=SEGMENT_COUNT, session=None, on_progress=None, timeout=30,
+                 expected_sha256=None, check=None):
+        self.url = url
+        self.dest_path = dest_path
+        self.part_path = dest_path + ".part"
+        self.state_path = dest_path + ".state"
+        self.segment_count = segments
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.check = check
+        self.session = session or get_session()
+        self._lock = threading.Lock()
+        self._last_progress = 0.0
+        self._last_state_save = 0.0
+        self.total = None
+        self.validator = None
+        self.segments = []  # [start, end, done] with end inclusive
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.sha256 = None
+        self._hasher = hashlib.sha256()
+        self._hash_pos = 0
+        self._hash_buffers = {}  # segment start -> [buffer start, bytearray]
+        self._buffered = 0
+
+    def run(self):
+        total, validator = self._probe()
+        if total is None:
+            self._download_single()
+            return self.dest_path
+        self.total = total
+        if not self._load_state(validator):
+            self._new_state()
+        self.validator = validator
+        with self._lock:
+            self._save_state()
+        pending = [seg for seg in self.segments if seg[0] + seg[2] <= seg[1]]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                futures = [pool.submit(self._fetch_segment, seg) for seg in pending]
+                errors = [f.exception() for f in futures if f.exception() is not None]
+            with self._lock:
+                self._save_state()
+            if errors:
+                raise errors[0]
+        with self._lock:
+            self._hash_advance()
+        self._report(force=True)
+        os.remove(self.state_path)
+        self._finish()
+        return self.dest_path
+
+    def _finish(self):
+        self.sha256 = self._hasher.hexdigest()
+        if self.expected_sha256 and self.sha256 != self.expected_sha256:
+            os.remove(self.part_path)
+            raise IntegrityError("Контролната сума на изтегления файл не съвпада. Файлът е изтрит.")
+        os.replace(self.part_path, self.dest_path)
+
+    def _hash_chunk(self, start, offset, chunk):
+        """Hash chunk (already written at offset by the segment at start); called under self._lock."""
+        if offset == self._hash_pos:
+            self._hasher.update(chunk)
+            self._hash_pos += len(chunk)
+        else:
+            buf = self._hash_buffers.setdefault(start, [offset, bytearray()])
+            if not buf[1]:
+                buf[0] = offset
+            if buf[0] + len(buf[1]) == offset and self._buffered + len(chunk) <= HASH_BUFFER_LIMIT:
+                buf[1] += chunk
+                self._buffered += len(chunk)
+        self._hash_advance()
+
+    def _hash_advance(self):
+        """Move the hash position over everything already written in order."""
+        for start, end, done in self.segments:
+            if not start <= self._hash_pos <= end:
+                continue
+            buf = self._hash_buffers.get(start)
+            while True:
+                if buf and buf[1] and buf[0] == self._hash_pos:
+                    self._hasher.update(buf[1])
+                    self._hash_pos += len(buf[1])
+                    self._buffered -= len(buf[1])
+                    buf[1] = bytearray()
+                    continue
+                limit = buf[0] if buf and buf[1] else start + done
+                if self._hash_pos >= limit:
+                    break
+                self._hash_read_back(limit)
+            if self._hash_pos <= end:
+                break
+
+    def _hash_read_back(self, limit):
+        with open(self.part_path, "rb") as f:
+            f.seek(self._hash_pos)
+            while self._hash_pos < limit:
+                data = f.read(min(CHUNK_SIZE * 16, limit - self._hash_pos))
+                if not data:
+                    raise IOError("Изтегленият файл е по-къс от очакваното.")
+                self._hasher.update(data)
+                self._hash_pos += len(data)
+
+    def _probe(self):
+        """Return (total size, validator) if the server serves byte ranges, else (None, None)."""
+        with self.session.get(self.url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            content_range = r.headers.get("Content-Range", "")
+            if r.status_code != 206 or "/" not in content_range:
+                return None, None
+            size = content_range.rsplit("/", 1)[1]
+            if not size.isdigit():
+                return None, None
+            return int(size), r.headers.get("ETag") or r.headers.get("Last-Modified")
+
+    def _load_state(self, validator):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if (state["url"] != self.url or state["total"] != self.total or state["validator"] != validator
+                    or os.path.getsize(self.part_path) != self.total):
+                return False
+            self.segments = state["segments"]
+            return True
+        except Exception:
+            return False
+
+    def _new_state(self):
+        count = max(1, min(self.segment_count, self.total // MIN_SEGMENT_SIZE))
+        size = -(-self.total // count)
+        self.segments = [[start, min(start + size, self.total) - 1, 0] for start in range(0, self.total, size)]
+        with open(self.part_path, "wb") as f:
+            f.truncate(self.total)
+
+    def _save_state(self):
+        state = {
+            "url": self.url,
+            "total": self.total,
+            "validator": self.validator,
+            "segments": self.segments,
+        }
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+        self._last_state_save = time.monotonic()
+
+    def _fetch_segment(self, seg):
+        start, end, done = seg
+        headers = {"Range": f"bytes={start + done}-{end}"}
+        with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise IOError("Сървърът не поддържа изтегляне на части.")
+            # Unbuffered, so bytes counted in the state file are already with the OS
+            with open(self.part_path, "r+b", buffering=0) as f:
+                f.seek(start + done)
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    if self.check:
+                        self.check()
+                    chunk = chunk[:end + 1 - start - seg[2]]
+                    f.write(chunk)
+                    with self._lock:
+                        offset = start + seg[2]
+                        seg[2] += len(chunk)
+                        self._hash_chunk(start, offset, chunk)
+                        if time.monotonic() - self._last_state_save >= STATE_SAVE_INTERVAL:
+                            self._save_state()
+                    self._report()
+                    if start + seg[2] > end:
+                        break
+        if start + seg[2] <= end:
+            raise IOError("Връзката беше прекъсната преди края на файла.")
+
+    def _download_single(self):
+        with self.session.get(self.url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            total_length = r.headers.get("content-length")
+            self.total = int(total_length) if total_length else None
+            self.segments = [[0, (self.total or 0) - 1, 0]]
+            with open(self.part_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        if self.check:
+                            self.check()
+                        f.write(chunk)
+                        self._hasher.update(chunk)
+                        self.segments[0][2] += len(chunk)
+                        self._report()
+        self._report(force=True)
+        self._finish()
+
+    def downloaded(self):
+        return sum(seg[2] for seg in self.segments)
+
+    def _report(self, force=False):
+        if not self.on_progress:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        if self.total:
+            self.on_progress(int(self.downloaded() * 100 / self.total))
+        elif force:
+            self.on_progress(100)
+
 class Downloader(QWidget):
     def __init__(self):
         super().__init__()
@@ -51,76 +349,69 @@ class Downloader(QWidget):
         self.button.clicked.connect(self.start_download)
         self.layout.addWidget(self.button)
 
-        self.signals = DownloadSignals()
-        self.signals.progress.connect(self.progress.setValue)
-        self.signals.finished.connect(self.download_finished)
-        self.signals.error.connect(self.download_error)
-
         self.downloading = False
         self.download_url = None
+        self.info = {}
+        self.bytes_saved = 0
+        self.download_task = None
 
-        # Start by fetching the latest version info
-        threading.Thread(target=self.fetch_latest_info, daemon=True).start()
+        # Start by fetching the latest version info; the widgets are only touched in the callbacks
+        self.info_task = tasks.submit(
+            "update_manifest", fetch_manifest, LATEST_JSON_URL, timeout=10, max_age=MANIFEST_REUSE_SECONDS,
+            on_result=self.show_latest_info,
+            on_error=lambda e: self.download_error(f"Грешка при изтегляне на информацията: {e}"),
+        )
 
-    def fetch_latest_info(self):
-        try:
-            r = requests.get(LATEST_JSON_URL, timeout=10)
-            r.raise_for_status()
-            info = r.json()
-            url = info.get("download_url")
-            ver = info.get("version", "")
-            changelog = info.get("changelog", "")
-            if url:
-                self.download_url = url
-                # Build the label text
-                label_text = f"Готово за изтегляне на версия {ver}.\n(Ще бъде изтеглен и инсталиран BGN/EUR Конвертор версия {ver})"
-                if changelog:
-                    label_text += f"\n\nНовостите:\n{changelog}"
-                self.label.setText(label_text)
-                self.button.setEnabled(True)
-            else:
-                self.download_error("Липсва адрес за изтегляне на инсталатора!")
-        except Exception as e:
-            self.download_error(f"Грешка при изтегляне на информацията: {e}")
+    def show_latest_info(self, info):
+        self.info = info
+        url = info.get("download_url")
+        ver = info.get("version", "")
+        changelog = info.get("changelog", "")
+        if url:
+            self.download_url = url
+            # Build the label text
+            label_text = f"Готово за изтегляне на версия {ver}.\n(Ще бъде изтеглен и инсталиран BGN/EUR Конвертор версия {ver})"
+            if changelog:
+                label_text += f"\n\nНовостите:\n{changelog}"
+            self.label.setText(label_text)
+            self.button.setEnabled(True)
+        else:
+            self.download_error("Липсва адрес за изтегляне на инсталатора!")
 
     def start_download(self):
         if self.downloading or not self.download_url:
             return
         self.downloading = True
         self.button.setEnabled(False)
-        threading.Thread(target=self.download_file, daemon=True).start()
+        dest_path = os.path.join(tempfile.gettempdir(), os.path.basename(self.download_url))
+        self.download_task = tasks.submit(
+            "update_download", self.download_file, self.download_url, dict(self.info), dest_path,
+            on_result=self.download_finished,
+            on_error=lambda e: self.download_error(str(e)),
+            on_progress=self.progress.setValue,
+        )
 
-    def download_file(self):
-        url = self.download_url
-        local_filename = os.path.basename(url)
-        temp_dir = tempfile.gettempdir()
-        dest_path = os.path.join(temp_dir, local_filename)
+    @staticmethod
+    def download_file(url, info, dest_path):
+        """Runs on the task pool; returns (dest_path, bytes saved by a delta update)."""
+        task = tasks.current_task()
+        saved = try_delta_update(info, dest_path, on_progress=task.report, check=task.check)
+        if saved is None:
+            SegmentedDownload(url, dest_path, on_progress=task.report,
+                              expected_sha256=info.get("sha256"), check=task.check).run()
+            saved = 0
         try:
-            with requests.get(url, stream=True, timeout=10) as r:
-                r.raise_for_status()
-                total_length = r.headers.get('content-length')
-                dl = 0
-                if total_length is None:
-                    with open(dest_path, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                    self.signals.progress.emit(100)
-                else:
-                    total_length = int(total_length)
-                    with open(dest_path, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                dl += len(chunk)
-                                percent = int(dl * 100 / total_length)
-                                self.signals.progress.emit(percent)
-            self.signals.finished.emit(dest_path)
-        except Exception as e:
-            self.signals.error.emit(str(e))
+            retain_payload(dest_path, info.get("version", ""))
+        except OSError as e:
+            print("Could not keep installer for delta updates:", e)
+        return dest_path, saved
 
-    def download_finished(self, dest_path):
-        self.label.setText("Изтеглянето приключи. Стартиране на инсталатора...")
+    def download_finished(self, result):
+        dest_path, self.bytes_saved = result
+        message = "Изтеглянето приключи. Стартиране на инсталатора..."
+        if self.bytes_saved:
+            message += f"\nИзтеглени са само разликите — спестени {self.bytes_saved / (1024 * 1024):.1f} MB."
+        self.label.setText(message)
         try:
             if run_installer_as_admin(dest_path):
                 self.close()
@@ -132,6 +423,13 @@ class Downloader(QWidget):
             self.button.setEnabled(True)
         self.downloading = False
 
+    def closeEvent(self, event):
+        # Progress reports raise tasks.Cancelled, which stops the download
+        for task in (self.info_task, self.download_task):
+            if task is not None:
+                task.cancel()
+        super().closeEvent(event)
+
     def download_error(self, message):
         self.label.setText("Грешка!")
         QMessageBox.critical(self, "Грешка", f"{message}")
@@ -142,4 +440,6 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     w = Downloader()
     w.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    tasks.get_executor().shutdown(2000)
+    sys.exit(code)